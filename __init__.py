@@ -1,14 +1,53 @@
-from .youtube import download_youtube
-from .instagram import download_instagram
-from .tiktok import TikTokDownloader
-from .facebook import download_facebook
-from .likee import download_likee, LikeeDownloader
+import importlib
+
+# الدوال المصدرة وموديولاتها، كل موديول منصة يحمل مع مكتباته عند أول استخدام
+_LAZY_EXPORTS = {
+    'download_youtube': 'youtube',
+    'download_instagram': 'instagram',
+    'download_tiktok': 'tiktok',
+    'stream_tiktok': 'tiktok',
+    'download_facebook': 'facebook',
+    'download_likee': 'likee',
+    'stream_likee': 'likee',
+    'LikeeDownloader': 'likee',
+    'download_twitter': 'twitter',
+    'DownloadScheduler': 'scheduler',
+    'SchedulerBusy': 'scheduler',
+}
+
+# موديولات المنصات ومكتباتها الثقيلة التي يمكن تحميلها مسبقاً في الخلفية
+PRELOAD_MODULES = ('.youtube', '.instagram', '.tiktok', '.facebook', '.likee', '.twitter', 'yt_dlp')
+
+
+def __getattr__(name):
+    module = _LAZY_EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_EXPORTS))
+
+
+def preload(modules: tuple = PRELOAD_MODULES):
+    """تحميل موديولات المنصات مسبقاً حتى لا ينتظرها أول مستخدم"""
+    for module in modules:
+        importlib.import_module(module, __name__)
+
 
 __all__ = [
     'download_youtube',
     'download_instagram',
-    'TikTokDownloader',
+    'download_tiktok',
+    'stream_tiktok',
     'download_facebook',
     'download_likee',
-    'LikeeDownloader'
+    'stream_likee',
+    'LikeeDownloader',
+    'download_twitter',
+    'DownloadScheduler',
+    'SchedulerBusy'
 ]
@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import asyncio
+import itertools
+import urllib.parse
+import aiohttp
+from aiohttp import web
+from yarl import URL
+
+# العناوين التي لا يعاد توجيهها إلى الخادم الوهمي
+LOCAL_HOSTS = ('127.0.0.1', 'localhost')
+
+# حجم كل جزء يرسله خادم الوسائط
+MEDIA_CHUNK_SIZE = 64 * 1024
+
+PAGE_TEMPLATE = '''<!DOCTYPE html>
+<html><head><title>{title}</title></head>
+<body>
+<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">{data}</script>
+</body></html>'''
+
+GENERIC_TEMPLATE = '''<!DOCTYPE html>
+<html><head>
+<title>{title}</title>
+<meta property="og:title" content="{title}">
+</head>
+<body>
+<video controls><source src="/media/{video_id}.mp4" type="video/mp4"></video>
+</body></html>'''
+
+
+def rewrite_request_class(target: str):
+    """صنف طلب لـ aiohttp يحول https://<host>/<path> إلى http://<target>/<host>/<path>
+
+    يمرر إلى http_client.start_session فتمر جميع طلبات المنصات (وإعادة التوجيه) إلى الخادم الوهمي دون تعديل الموديولات.
+    """
+    target = target.rstrip('/')
+
+    class RewriteRequest(aiohttp.ClientRequest):
+        def __init__(self, method, url, *args, **kwargs):
+            if url.host not in LOCAL_HOSTS:
+                url = URL(f"{target}/{url.host}{url.raw_path_qs}", encoded=True)
+            super().__init__(method, url, *args, **kwargs)
+
+    return RewriteRequest
+
+
+class FakeServer:
+    """خادم aiohttp محلي على منفذ عشوائي"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.app = web.Application(middlewares=[self._delay], client_max_size=4 * 1024 ** 3)
+        self.runner = None
+        self.url = None
+
+    @web.middleware
+    async def _delay(self, request, handler):
+        # محاكاة زمن الذهاب والعودة للشبكة
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    async def start(self) -> str:
+        self.runner = web.AppRunner(self.app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self.url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+class FakePlatforms(FakeServer):
+    """صفحات وواجهات وملفات وسائط بديلة لمنصات التحميل"""
+
+    def __init__(self, media_size: int, latency: float = 0.0):
+        super().__init__(latency)
+        self.media = os.urandom(media_size)
+        self.requests = 0
+        self.bytes_sent = 0
+        self.app.router.add_get('/likee.video/api/video/info', self.likee_info)
+        self.app.router.add_route('*', '/{host}/@{user}/video/{video_id}', self.tiktok_page)
+        self.app.router.add_route('*', '/vm.tiktok.com/{code}/', self.tiktok_short)
+        self.app.router.add_get('/generic/{video_id}', self.generic_page)
+        self.app.router.add_route('*', '/media/{name}', self.media_file)
+        self.app.router.add_route('*', '/{host}/media/{name}', self.media_file)
+
+    async def likee_info(self, request):
+        self.requests += 1
+        video_id = request.query.get('video_id', '')
+        return web.json_response({
+            'code': 0,
+            'data': {
+                'video_url': f"https://likee-cdn.bench/media/likee_{video_id}.mp4",
+                'title': f"likee bench {video_id}",
+            }
+        })
+
+    async def tiktok_page(self, request):
+        self.requests += 1
+        video_id = request.match_info['video_id']
+        data = {
+            '__DEFAULT_SCOPE__': {
+                'webapp.video-detail': {
+                    'itemInfo': {
+                        'itemStruct': {
+                            'id': video_id,
+                            'desc': f"tiktok bench {video_id}",
+                            'video': {'playAddr': f"https://v16-webapp.tiktokcdn.bench/media/tiktok_{video_id}.mp4"},
+                        }
+                    }
+                }
+            }
+        }
+        response = web.Response(
+            text=PAGE_TEMPLATE.format(title=f"tiktok {video_id}", data=json.dumps(data)),
+            content_type='text/html'
+        )
+        response.set_cookie('tt_chain_token', f"bench{video_id}")
+        return response
+
+    async def tiktok_short(self, request):
+        self.requests += 1
+        # رابط مختصر يحول إلى صفحة الفيديو الكاملة
+        code = request.match_info['code']
+        video_id = int.from_bytes(code.encode(), 'big') % 10 ** 19
+        raise web.HTTPFound(f"https://www.tiktok.com/@bench/video/{video_id}")
+
+    async def generic_page(self, request):
+        self.requests += 1
+        video_id = request.match_info['video_id'].rsplit('.', 1)[0]
+        return web.Response(
+            text=GENERIC_TEMPLATE.format(title=f"generic bench {video_id}", video_id=video_id),
+            content_type='text/html'
+        )
+
+    async def media_file(self, request):
+        self.requests += 1
+        response = web.StreamResponse(headers={'Content-Type': 'video/mp4', 'Accept-Ranges': 'bytes'})
+        response.content_length = len(self.media)
+        await response.prepare(request)
+        if request.method == 'HEAD':
+            return response
+        view = memoryview(self.media)
+        for offset in range(0, len(view), MEDIA_CHUNK_SIZE):
+            chunk = view[offset:offset + MEDIA_CHUNK_SIZE]
+            await response.write(chunk)
+            self.bytes_sent += len(chunk)
+        await response.write_eof()
+        return response
+
+
+class FakeBotAPI(FakeServer):
+    """خادم بديل لواجهة Bot API يقبل الرسائل والملفات ويعيد ردوداً صالحة"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency)
+        self.app.router.add_post('/bot{token}/{method}', self.handle)
+        self.app.router.add_get('/bot{token}/{method}', self.handle)
+        self._message_ids = itertools.count(1)
+        self._file_ids = itertools.count(1)
+        self.calls = {}
+        self.uploaded_bytes = 0
+        # المحادثات التي وصلها فيديو
+        self.video_chats = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/bot"
+
+    async def _read_params(self, request) -> dict:
+        """قراءة المعاملات من multipart أو form أو JSON مع عد البايتات المرفوعة"""
+        content_type = request.content_type
+        if content_type.startswith('multipart/'):
+            params = {}
+            reader = await request.multipart()
+            while True:
+                part = await reader.next()
+                if part is None:
+                    break
+                if part.filename:
+                    size = 0
+                    while True:
+                        chunk = await part.read_chunk()
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                    self.uploaded_bytes += size
+                    params[part.name] = f"attach://{part.name}"
+                else:
+                    params[part.name] = await part.text()
+            return params
+        if content_type == 'application/json':
+            return await request.json()
+        return dict(await request.post())
+
+    def _message(self, chat_id, **extra) -> dict:
+        return {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            **extra
+        }
+
+    async def handle(self, request):
+        method = request.match_info['method']
+        self.calls[method] = self.calls.get(method, 0) + 1
+        params = await self._read_params(request)
+
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+        elif method in ('sendMessage', 'editMessageText'):
+            result = self._message(params.get('chat_id', 0), text=params.get('text', ''))
+        elif method in ('sendVideo', 'sendAudio', 'sendDocument'):
+            field = method[4:].lower()
+            file_id = params.get(field, '')
+            # ملف جديد مرفوع يحصل على معرف جديد، والمعرف السابق يعاد كما هو
+            if not file_id or file_id.startswith('attach://'):
+                file_id = f"BENCH{next(self._file_ids)}"
+            media = {'file_id': file_id, 'file_unique_id': file_id, 'duration': 1}
+            if field == 'video':
+                media.update(width=1, height=1)
+            chat_id = params.get('chat_id', 0)
+            self.video_chats.add(int(chat_id))
+            result = self._message(chat_id, caption=params.get('caption', ''), **{field: media})
+        elif method in ('deleteMessage', 'answerCallbackQuery'):
+            result = True
+        else:
+            return web.json_response({'ok': False, 'error_code': 404, 'description': f"Not Found: {method}"}, status=404)
+
+        return web.json_response({'ok': True, 'result': result})
+
+
+async def download_generic(url: str, download_dir: str) -> tuple:
+    """تحميل صفحة عامة عبر yt-dlp بنفس مسار تحميل المنصات المعتمدة على yt-dlp"""
+    from downloaders import ytdlp_runner
+
+    ydl_opts = {
+        'outtmpl': os.path.join(download_dir, 'generic_%(id)s.%(ext)s'),
+        'quiet': True,
+        'no_warnings': True,
+    }
+    file_path, info = await ytdlp_runner.download_within_limit(ydl_opts, url, 'generic')
+    return file_path, info.get('title') or urllib.parse.urlsplit(url).path
@@ -0,0 +1,309 @@
+"""قياس أداء البوت دون اتصال بالمنصات الحقيقية
+
+يشغل خوادم محلية بديلة للمنصات ولواجهة Bot API ثم يرسل الروابط إلى handle_url بتوازٍ محدد،
+ويطبع زمن الاستجابة (p50/p95/p99) والإنتاجية وأقصى استهلاك للذاكرة لكل منصة.
+
+    python benchmarks/run.py --requests 200 --concurrency 16 --output bench.json
+    python benchmarks/run.py --baseline bench.json
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import importlib
+import importlib.util
+import itertools
+import tempfile
+import threading
+import logging
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from fake_servers import FakePlatforms, FakeBotAPI, LOCAL_HOSTS, rewrite_request_class
+
+BENCH_TOKEN = '123456:BENCH'
+
+# بداية معرفات المحادثات الوهمية، كل طلب من محادثة مختلفة
+CHAT_BASE = 10_000
+
+# الروابط المرسلة لكل سيناريو حسب رقم الفيديو
+SCENARIOS = {
+    'likee': lambda n, server: f"https://likee.video/v/bench{n}",
+    'tiktok': lambda n, server: f"https://www.tiktok.com/@bench/video/{7_000_000_000_000_000_000 + n}",
+    'tiktok-short': lambda n, server: f"https://vm.tiktok.com/ZS{n}/",
+    'generic': lambda n, server: f"{server}/generic/bench{n}.html",
+}
+
+
+def load_package():
+    """تحميل مجلد المستودع باسم downloaders كما يستورده bot.py"""
+    if 'downloaders' in sys.modules:
+        return sys.modules['downloaders']
+    spec = importlib.util.spec_from_file_location(
+        'downloaders',
+        os.path.join(REPO_DIR, '__init__.py'),
+        submodule_search_locations=[REPO_DIR]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules['downloaders'] = package
+    spec.loader.exec_module(package)
+    return package
+
+
+class RSSMonitor:
+    """قياس أقصى استهلاك للذاكرة خلال فترة في خيط منفصل"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current() -> int:
+        try:
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            import resource
+            # بديل للأنظمة دون /proc: أقصى قيمة منذ بدء العملية (KB في لينكس)
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+    def __enter__(self):
+        self.peak = self.current()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+def percentile(values: list, p: float) -> float:
+    """النسبة المئوية بطريقة أقرب رتبة"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+class Bench:
+    """تشغيل السيناريوهات على handle_url وجمع النتائج"""
+
+    def __init__(self, args):
+        self.args = args
+        self.platforms = FakePlatforms(args.media_size * 1024, latency=args.server_latency / 1000)
+        self.api = FakeBotAPI(latency=args.api_latency / 1000)
+        self.sequence = itertools.count()
+        self.bot_module = None
+        self.application = None
+        self.context = None
+
+    async def start(self):
+        from telegram.ext import Application, CallbackContext
+        from downloaders import http_client
+
+        await self.platforms.start()
+        await self.api.start()
+
+        self.bot_module = importlib.import_module('downloaders.bot')
+        logging.getLogger().setLevel(self.args.log_level)
+
+        # إضافة تحميل لصفحات yt-dlp العامة على الخادم المحلي
+        if importlib.util.find_spec('yt_dlp'):
+            from downloaders.registry import registry, Downloader
+            registry.register(Downloader('generic', hosts=list(LOCAL_HOSTS), download='fake_servers:download_generic'))
+
+        # جميع طلبات المنصات عبر الجلسة المشتركة تذهب إلى الخادم الوهمي
+        await http_client.start_session(request_class=rewrite_request_class(self.platforms.url))
+
+        # نفس إعدادات التطبيق الفعلي مع خادم Bot API الوهمي
+        self.application = (
+            Application.builder()
+            .token(BENCH_TOKEN)
+            .base_url(self.api.base_url)
+            .build()
+        )
+        await self.application.initialize()
+        await self.bot_module.on_startup(self.application)
+        self.context = CallbackContext(self.application)
+
+    async def stop(self):
+        if self.application:
+            await self.bot_module.on_shutdown(self.application)
+            await self.application.shutdown()
+        await self.platforms.stop()
+        await self.api.stop()
+
+    def make_update(self, url: str):
+        from telegram import Update
+
+        seq = next(self.sequence)
+        chat_id = CHAT_BASE + seq
+        user = {'id': chat_id, 'is_bot': False, 'first_name': 'Bench', 'username': f"bench{seq}"}
+        data = {
+            'update_id': seq,
+            'message': {
+                'message_id': seq,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': user,
+                'text': url,
+            }
+        }
+        return Update.de_json(data, self.application.bot), chat_id
+
+    def make_url(self, scenario: str, index: int) -> str:
+        # تكرار الفيديوهات يختبر ذاكرة معرفات الملفات ودمج الطلبات
+        if self.args.distinct:
+            index %= self.args.distinct
+        return SCENARIOS[scenario](index, self.platforms.url)
+
+    async def _request(self, semaphore, url: str) -> tuple:
+        update, chat_id = self.make_update(url)
+        async with semaphore:
+            started = time.perf_counter()
+            await self.bot_module.handle_url(update, self.context)
+            elapsed = time.perf_counter() - started
+        return elapsed, chat_id in self.api.video_chats
+
+    async def run_scenario(self, scenario: str) -> dict:
+        args = self.args
+        semaphore = asyncio.Semaphore(args.concurrency)
+        ids = itertools.count()
+
+        # طلبات الإحماء لا تدخل في النتائج
+        await asyncio.gather(*(self._request(semaphore, self.make_url(scenario, next(ids)))
+                               for _ in range(args.warmup)))
+
+        downloaded = self.platforms.bytes_sent
+        uploaded = self.api.uploaded_bytes
+        with RSSMonitor() as rss:
+            started = time.perf_counter()
+            results = await asyncio.gather(*(self._request(semaphore, self.make_url(scenario, next(ids)))
+                                             for _ in range(args.requests)))
+            wall = time.perf_counter() - started
+
+        latencies = [elapsed for elapsed, ok in results if ok]
+        failed = len(results) - len(latencies)
+        return {
+            'requests': len(results),
+            'succeeded': len(latencies),
+            'failed': failed,
+            'concurrency': args.concurrency,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': max(latencies, default=0.0) * 1000,
+            'throughput_rps': len(latencies) / wall if wall else 0.0,
+            'wall_s': wall,
+            'peak_rss_mb': rss.peak / 1024 / 1024,
+            'downloaded_mb': (self.platforms.bytes_sent - downloaded) / 1024 / 1024,
+            'uploaded_mb': (self.api.uploaded_bytes - uploaded) / 1024 / 1024,
+        }
+
+    async def run(self) -> dict:
+        results = {}
+        await self.start()
+        try:
+            for scenario in self.args.scenarios:
+                if scenario == 'generic' and not importlib.util.find_spec('yt_dlp'):
+                    print(f"skipping {scenario}: yt_dlp is not installed")
+                    continue
+                results[scenario] = await self.run_scenario(scenario)
+                print_result(scenario, results[scenario])
+        finally:
+            await self.stop()
+        return results
+
+
+def print_result(scenario: str, result: dict):
+    print(
+        f"{scenario:<14} ok {result['succeeded']:>5}/{result['requests']:<5} "
+        f"p50 {result['p50_ms']:>8.1f}ms  p95 {result['p95_ms']:>8.1f}ms  p99 {result['p99_ms']:>8.1f}ms  "
+        f"{result['throughput_rps']:>7.1f} req/s  rss {result['peak_rss_mb']:>7.1f}MB"
+    )
+
+
+def compare(results: dict, baseline: dict):
+    """طباعة الفرق بين النتائج الحالية ونتائج سابقة"""
+    print("\nchange vs baseline (lower is better for latency and rss):")
+    for scenario, result in results.items():
+        base = baseline.get(scenario)
+        if not base:
+            print(f"{scenario:<14} no baseline")
+            continue
+        changes = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'peak_rss_mb'):
+            if base.get(key):
+                changes.append(f"{key} {(result[key] - base[key]) / base[key] * 100:+.1f}%")
+        print(f"{scenario:<14} " + "  ".join(changes))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark for handle_url")
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=100, help="measured requests per scenario")
+    parser.add_argument('--warmup', type=int, default=5, help="unmeasured requests before each scenario")
+    parser.add_argument('--concurrency', type=int, default=8, help="requests handled at the same time")
+    parser.add_argument('--distinct', type=int, default=0,
+                        help="number of distinct videos per scenario (0 = every request is a new video)")
+    parser.add_argument('--media-size', type=int, default=2048, help="media file size in KB")
+    parser.add_argument('--server-latency', type=float, default=0.0, help="added platform latency in ms")
+    parser.add_argument('--api-latency', type=float, default=0.0, help="added Bot API latency in ms")
+    parser.add_argument('--no-stream', action='store_true', help="disable in-memory uploads (STREAM_UPLOADS=0)")
+    parser.add_argument('--output', help="write results as JSON")
+    parser.add_argument('--baseline', help="compare with a previous --output file")
+    parser.add_argument('--log-level', default='WARNING')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    # بيئة معزولة: قاعدة بيانات ومجلد تحميل مؤقتان ودون وكلاء
+    workdir = tempfile.mkdtemp(prefix='bench-')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'bench.db')
+    os.environ['PROXY_LIST'] = ''
+    os.environ.pop('PROXY_FILE', None)
+    os.environ.pop('METADATA_CACHE_DB', None)
+    os.environ.pop('LOCAL_BOT_API_URL', None)
+    os.environ['BOT_TOKEN'] = BENCH_TOKEN
+    os.environ.setdefault('METRICS_PORT', '0')
+    if args.no_stream:
+        os.environ['STREAM_UPLOADS'] = '0'
+    os.chdir(workdir)
+    load_package()
+
+    results = asyncio.run(Bench(args).run())
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare(results, json.load(f)['scenarios'])
+    if args.output:
+        report = {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'args': vars(args),
+            'scenarios': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(f"\nwork directory: {workdir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
+import time
+STARTUP_BEGIN = time.perf_counter()
+
 import os
 import sys
 import logging
-import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta, time as dt_time
 import pytz
 import asyncio
-import yt_dlp
-import requests
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
@@ -19,18 +19,32 @@ from telegram.ext import (
     CallbackContext
 )
 import subprocess
-import instaloader
-from instagram_private_api import Client, ClientCompatPatch
-import aiohttp
-import json
-from instascrape import Reel, Post
-from downloaders import (
-    download_youtube, download_instagram, TikTokDownloader,
-    download_facebook, LikeeDownloader
-)
-import urllib.parse
+import contextlib
+from pathlib import Path
+# موديولات المنصات تحمل عند أول استخدام عبر downloaders.<name>
+import downloaders
+from downloaders import ytdlp_runner, http_client
+from downloaders.scheduler import DownloadScheduler
+from downloaders.registry import registry
+from downloaders.resolver import short_links
+from downloaders.canonical import has_video_id
+from downloaders.file_cache import FileIdCache
+from downloaders.database import db
+from downloaders.stats_buffer import StatsBuffer
+from downloaders.broadcast import Broadcaster
+from downloaders.inflight import InFlightRequests
+from downloaders.browser_pool import browser_pool
+from downloaders.proxy_pool import proxy_pool
+from downloaders.metadata_cache import metadata_cache
+from downloaders import metrics
+from downloaders.metrics import metrics_server
+from downloaders.tracing import tracer, stage
+from downloaders.limits import get_max_file_size, format_size, is_local_mode, LOCAL_BOT_API_URL
 from dotenv import load_dotenv
 
+# الوقت المستغرق في تحميل المكتبات عند بدء التشغيل
+IMPORT_TIME = time.perf_counter() - STARTUP_BEGIN
+
 # تحميل المتغيرات البيئية
 load_dotenv()
 
@@ -57,6 +71,49 @@ DOWNLOAD_DIR = os.path.abspath("downloads")
 if not os.path.exists(DOWNLOAD_DIR):
     os.makedirs(DOWNLOAD_DIR)
 
+# مجدول التحميلات: حد عام للتحميلات المتزامنة وحجم قائمة الانتظار
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "8"))
+MAX_QUEUED_DOWNLOADS = int(os.getenv("MAX_QUEUED_DOWNLOADS", "32"))
+download_scheduler = DownloadScheduler(
+    global_limit=MAX_CONCURRENT_DOWNLOADS,
+    max_queue=MAX_QUEUED_DOWNLOADS
+)
+
+# عدد التحديثات المعالجة بالتوازي، أعلى بكثير من سعة المجدول حتى يقرر المجدول وحده قبول التحميل
+# أو الرد فوراً بأن البوت مشغول، ولا تنتظر الأوامر ورسائل الذاكرة المؤقتة خلف التحميلات
+MAX_CONCURRENT_UPDATES = max(
+    int(os.getenv("MAX_CONCURRENT_UPDATES", "1024")),
+    (MAX_CONCURRENT_DOWNLOADS + MAX_QUEUED_DOWNLOADS) * 4
+)
+
+# ذاكرة مؤقتة لمعرفات ملفات تيليجرام لإعادة إرسال الروابط المتكررة دون تحميل
+file_cache = FileIdCache(
+    db,
+    ttl=int(os.getenv("FILE_CACHE_TTL_DAYS", "30")) * 24 * 3600,
+    max_entries=int(os.getenv("FILE_CACHE_MAX_ENTRIES", "50000"))
+)
+
+# تجميع تحديثات الإحصائيات وحفظها دفعة واحدة
+stats_buffer = StatsBuffer(db)
+
+# تحميل موديولات المنصات في الخلفية بعد بدء التشغيل
+PREWARM_PLATFORMS = os.getenv("PREWARM_PLATFORMS", "1") != "0"
+
+# البث الجماعي للرسائل مع حفظ التقدم
+broadcaster = Broadcaster(db)
+
+# دمج الطلبات المتزامنة لنفس الفيديو
+inflight_downloads = InFlightRequests()
+
+# رفع الفيديو مباشرة من الذاكرة للمنصات التي تدعم ذلك دون حفظه في مجلد التحميلات
+STREAM_UPLOADS = os.getenv("STREAM_UPLOADS", "1") != "0"
+
+# مقاييس المجدول والذاكرات المؤقتة تقرأ من عداداتها عند كل طلب لـ /metrics
+metrics.QUEUE_DEPTH.set_function(lambda: download_scheduler.platform_waiting)
+metrics.RUNNING_JOBS.set_function(lambda: download_scheduler.platform_running)
+metrics.INFLIGHT_JOBS.set_function(lambda: len(inflight_downloads))
+metrics.track_caches({'file_id': file_cache, 'metadata': metadata_cache, 'short_link': short_links})
+
 # تعيين المنطقة الزمنية
 TIMEZONE = pytz.timezone('Asia/Riyadh')
 
@@ -119,132 +176,103 @@ def get_user_level(points: int) -> str:
     else:
         return "👑 أسطوري"
 
-def update_user_points(user_id, points_to_add):
-    conn = sqlite3.connect('bot_data.db')
-    c = conn.cursor()
-    c.execute("UPDATE users SET points = points + ? WHERE user_id = ?", (points_to_add, user_id))
-    c.execute("SELECT points FROM users WHERE user_id = ?", (user_id,))
-    total_points = c.fetchone()[0]
-    new_level = get_user_level(total_points)
-    c.execute("UPDATE users SET level = ? WHERE user_id = ?", (new_level, user_id))
-    conn.commit()
-    conn.close()
-    return total_points, new_level
-
-def send_monthly_stats():
-    """إرسال إحصائيات شهرية للمشرفين"""
-    try:
-        conn = sqlite3.connect('bot_data.db')
-        c = conn.cursor()
-        
-        # الحصول على الشهر الحالي مع المنطقة الزمنية
-        current_month = datetime.now(TIMEZONE).strftime("%Y-%m")
-        
-        # الحصول على إحصائيات الشهر لكل مستخدم
-        c.execute("""
-            SELECT user_id, COUNT(*) as downloads, SUM(points) as points 
-            FROM downloads 
-            WHERE strftime('%Y-%m', date) = ? 
-            GROUP BY user_id
-        """, (current_month,))
-        
-        stats = c.fetchall()
+async def send_monthly_stats(bot, month: str = None) -> dict:
+    """إرسال إحصائيات الشهر لكل مستخدم عبر البث الجماعي"""
+    # الشهر الحالي مع المنطقة الزمنية إذا لم يحدد
+    month = month or datetime.now(TIMEZONE).strftime("%Y-%m")
+    name = f"monthly_stats:{month}"
+    
+    # البث يسجل مرة واحدة لكل شهر، والتشغيل مرة أخرى يستكمل الرسائل المعلقة فقط
+    if not await broadcaster.exists(name):
+        await stats_buffer.flush()
+        stats = await db.monthly_summary(month)
         
+        messages = []
         for user_id, downloads, points in stats:
             stats_message = f"""📊 *إحصائيات الشهر*
             
-📅 شهر: {current_month}
+📅 شهر: {month}
 📥 عدد التحميلات: {downloads}
 ✨ النقاط المكتسبة: {points}
 
 تابع استخدام البوت للحصول على المزيد من النقاط والمميزات! 🚀"""
-            
-            try:
-                # إرسال الإحصائيات للمستخدم
-                application.bot.send_message(chat_id=user_id, text=stats_message, parse_mode='Markdown')
-            except Exception as e:
-                print(f"Error sending monthly stats to user {user_id}: {e}")
-        
-        conn.close()
+            messages.append((user_id, stats_message))
         
+        await broadcaster.create(name, messages, parse_mode='Markdown')
+        logger.info(f"Created broadcast {name} for {len(messages)} users")
+    
+    return await broadcaster.run(bot, name)
+
+async def monthly_stats_job(context: ContextTypes.DEFAULT_TYPE):
+    """إرسال إحصائيات الشهر الماضي في بداية كل شهر"""
+    previous_month = (datetime.now(TIMEZONE).replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+    try:
+        await send_monthly_stats(context.bot, previous_month)
     except Exception as e:
-        print(f"Error in send_monthly_stats: {e}")
+        logger.error(f"Error in send_monthly_stats: {str(e)}")
 
-def admin_dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def broadcast_monthly(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """إرسال أو استكمال إحصائيات الشهر يدوياً (للمشرفين)"""
     if update.effective_user.id not in ADMIN_IDS:
-        update.message.reply_text("⛔ عذراً، هذا الأمر متاح للمشرفين فقط.")
+        await update.message.reply_text("⛔ عذراً، هذا الأمر متاح للمشرفين فقط.")
         return
     
-    conn = sqlite3.connect('bot_data.db')
-    c = conn.cursor()
-    
-    # إحصائيات عامة
-    c.execute("SELECT COUNT(*) FROM users")
-    total_users = c.fetchone()[0]
-    
-    c.execute("SELECT COUNT(*) FROM downloads")
-    total_downloads = c.fetchone()[0]
-    
-    c.execute("SELECT COUNT(*) FROM downloads WHERE date >= datetime('now', '-24 hours')")
-    downloads_24h = c.fetchone()[0]
+    month = context.args[0] if context.args else None
+    await update.message.reply_text("📤 جاري إرسال الإحصائيات الشهرية...")
+    try:
+        progress = await send_monthly_stats(context.bot, month)
+        await update.message.reply_text(
+            f"✅ تم الإرسال: {progress['sent']} | فشل: {progress['failed']} | متبقي: {progress['pending']}"
+        )
+    except Exception as e:
+        logger.error(f"Error in send_monthly_stats: {str(e)}")
+        await update.message.reply_text("❌ حدث خطأ أثناء إرسال الإحصائيات")
+
+async def admin_dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("⛔ عذراً، هذا الأمر متاح للمشرفين فقط.")
+        return
     
-    # المستخدمين الأكثر نشاطاً
-    c.execute("""
-        SELECT username, downloads, points, level 
-        FROM users 
-        ORDER BY downloads DESC 
-        LIMIT 5
-    """)
-    top_users = c.fetchall()
+    await stats_buffer.flush()
+    stats = await db.dashboard(datetime.now(TIMEZONE) - timedelta(hours=24))
     
     dashboard_text = f"""📊 *لوحة التحكم*
 
 📈 *إحصائيات عامة*:
-👥 إجمالي المستخدمين: {total_users}
-📥 إجمالي التحميلات: {total_downloads}
-⚡ تحميلات آخر 24 ساعة: {downloads_24h}
+👥 إجمالي المستخدمين: {stats['total_users']}
+📥 إجمالي التحميلات: {stats['total_downloads']}
+⚡ تحميلات آخر 24 ساعة: {stats['downloads_24h']}
 
 🏆 *أفضل 5 مستخدمين*:
 """
     
-    for user in top_users:
-        username, downloads, points, level = user
-        dashboard_text += f"\n@{username or 'Unknown'}: {downloads} تحميل | {points} نقطة | {level}"
+    # المستخدمين الأكثر نشاطاً
+    for username, downloads, points in stats['top_users']:
+        dashboard_text += f"\n@{username or 'Unknown'}: {downloads} تحميل | {points} نقطة | {get_user_level(points)}"
+    
+    await update.message.reply_text(dashboard_text, parse_mode='Markdown')
+
+async def proxy_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """عرض إحصائيات الوكلاء للمشرفين"""
+    if update.effective_user.id not in ADMIN_IDS:
+        await update.message.reply_text("⛔ عذراً، هذا الأمر متاح للمشرفين فقط.")
+        return
     
-    conn.close()
+    lines = ["🌐 *حالة الوكلاء*\n"]
+    for proxy in proxy_pool.stats():
+        status = "✅" if proxy['available'] else "⛔"
+        latency = f"{proxy['latency'] * 1000:.0f}ms" if proxy['latency'] is not None else "-"
+        lines.append(
+            f"{status} `{proxy['url']}` | نجاح: {proxy['successes']} | فشل: {proxy['failures']} | {latency}"
+        )
+    if len(lines) == 1:
+        lines.append("لا توجد وكلاء")
     
-    update.message.reply_text(dashboard_text, parse_mode='Markdown')
+    await update.message.reply_text("\n".join(lines), parse_mode='Markdown')
 
 def get_platform(url):
     """تحديد نوع المنصة من الرابط"""
-    try:
-        # تنظيف الرابط من الفراغات
-        url = url.strip()
-        
-        # التحقق من أن الرابط يبدأ ببروتوكول
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url
-            
-        parsed = urllib.parse.urlparse(url)
-        domain = parsed.netloc.lower()
-        path = parsed.path.lower()
-        
-        # فحص المنصات المدعومة
-        if any(x in domain for x in ['youtube.com', 'youtu.be']):
-            return 'youtube'
-        elif any(x in domain for x in ['instagram.com', 'instagr.am']) or '/reel/' in path or '/p/' in path:
-            return 'instagram'
-        elif any(x in domain for x in ['tiktok.com', 'douyin.com', 'vm.tiktok.com', 'vt.tiktok.com']):
-            return 'tiktok'
-        elif any(x in domain for x in ['facebook.com', 'fb.watch', 'fb.com']):
-            return 'facebook'
-        elif any(x in domain for x in ['likee.com', 'l.likee.video', 'likee.video']):
-            return 'likee'
-        else:
-            return 'unknown'
-    except Exception as e:
-        logger.error(f"Error parsing URL: {str(e)}")
-        return 'unknown'
+    return registry.platform(url)
 
 def get_platform_options(platform):
     options = {
@@ -292,28 +320,113 @@ def ensure_downloads_directory():
     """التأكد من وجود مجلد التنزيلات"""
     if not os.path.exists('downloads'):
         os.makedirs('downloads')
-        print("Created downloads directory")
+        logger.info("Created downloads directory")
     return os.path.abspath('downloads')
 
 def clean_filename(filename):
     """تنظيف اسم الملف من الأحرف غير المسموح بها"""
     return "".join(c for c in filename if c.isalnum() or c in (' ', '-', '_', '.')).rstrip()
 
-def get_video_info(url, platform):
+async def get_video_info(url, platform):
     """الحصول على معلومات الفيديو قبل التحميل"""
     try:
         options = get_platform_options(platform)
-        options['extract_info'] = True
-        options['download'] = False
         
-        with yt_dlp.YoutubeDL(options) as ydl:
-            return ydl.extract_info(url, download=False)
+        # القراءة من ذاكرة المعلومات المؤقتة أولاً ثم الاستخراج في المجمع
+        return await ytdlp_runner.extract_info(options, url, platform)
     except Exception as e:
-        print(f"Error getting video info: {str(e)}")
+        logger.error(f"Error getting video info: {str(e)}")
         return None
 
+async def download_media(url: str, options: dict, audio_only: bool = False) -> str:
+    """تحميل الوسائط بخيارات yt-dlp مع اختيار صيغة ضمن الحد المسموح"""
+    file_path, info = await ytdlp_runner.download_within_limit(options, url, get_platform(url), audio_only=audio_only)
+    return file_path
+
+async def download_video(url: str) -> tuple:
+    """تحميل الفيديو من زر التحميل"""
+    file_path = await download_scheduler.run(get_platform(url), download_media, url, VIDEO_OPTS)
+    return file_path, 'video'
+
+async def download_audio(url: str) -> tuple:
+    """تحميل الصوت من زر التحميل"""
+    file_path = await download_scheduler.run(get_platform(url), download_media, url, AUDIO_OPTS, audio_only=True)
+    return file_path, 'audio'
+
+async def download_platform_video(platform: str, url: str) -> tuple:
+    """تحميل الفيديو من المنصة المناسبة عبر المجدول"""
+    logger.info(f"Downloading from platform: {platform}")
+    logger.info(f"URL: {url}")
+    
+    downloader = registry.get(platform)
+    if downloader is None:
+        raise Exception("❌ عذراً، هذا الرابط غير مدعوم")
+    
+    # المنصات التي لا تحتاج معالجة بعد التحميل ترفع من الذاكرة مباشرة
+    # الخادم المحلي يقرأ الملفات من القرص، فالرفع من الذاكرة لا يفيد معه
+    if STREAM_UPLOADS and not is_local_mode() and downloader.stream:
+        return await download_scheduler.run(platform, downloader.get_stream(), url, DOWNLOAD_DIR)
+    
+    return await download_scheduler.run(platform, downloader.get_download(), url, DOWNLOAD_DIR)
+
+@contextlib.contextmanager
+def open_upload(path: str):
+    """فتح الملف للإرسال، أو تمرير مساره للخادم المحلي ليقرأه دون رفع"""
+    if is_local_mode():
+        yield Path(path)
+    else:
+        with open(path, 'rb') as f:
+            yield f
+
+async def download_and_send(update: Update, platform: str, url: str, video_id: str) -> tuple:
+    """تحميل الفيديو وإرساله للمحادثة الأولى وإرجاع (file_id, title)"""
+    video, title = await download_platform_video(platform, url)
+    
+    if isinstance(video, str):
+        # ملف محفوظ على القرص
+        if not os.path.exists(video):
+            raise Exception("❌ فشل تحميل الفيديو")
+        try:
+            file_size = os.path.getsize(video)
+            with open_upload(video) as f, stage(platform, 'upload', bytes=file_size):
+                sent_message = await update.message.reply_video(
+                    video=f,
+                    caption=f"✅ {title}",
+                    reply_to_message_id=update.message.message_id
+                )
+        finally:
+            # حذف الملف بعد الإرسال
+            os.remove(video)
+    else:
+        # مخزن مؤقت في الذاكرة يرفع مباشرة
+        try:
+            file_size = video.seek(0, os.SEEK_END)
+            video.seek(0)
+            with stage(platform, 'upload', bytes=file_size):
+                sent_message = await update.message.reply_video(
+                    video=video,
+                    filename=f"{platform}_{video_id}.mp4",
+                    caption=f"✅ {title}",
+                    reply_to_message_id=update.message.message_id
+                )
+        finally:
+            video.close()
+    
+    # الخادم المحلي يقرأ الملف من القرص فلا توجد بايتات مرفوعة
+    if not (isinstance(video, str) and is_local_mode()):
+        metrics.UPLOADED_BYTES.inc(file_size, platform=platform)
+    
+    # تخزين معرف الملف لإعادة استخدامه إذا كان للرابط معرف فيديو حقيقي
+    sent_file = sent_message.video or sent_message.animation or sent_message.document
+    file_id = sent_file.file_id if sent_file else None
+    if file_id and has_video_id(url, platform):
+        await file_cache.set(platform, video_id, 'video', file_id, title, file_size)
+    
+    return file_id, title
+
 async def handle_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """معالجة الروابط المرسلة"""
+    trace = None
     try:
         url = update.message.text.strip()
         
@@ -321,53 +434,82 @@ async def handle_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
+        # تحديد نوع الرابط
+        started = time.perf_counter()
+        platform = get_platform(url)
+        metrics.REQUESTS.inc(platform=platform)
+        
+        # تتبع مراحل الطلب، ينتقل تلقائياً إلى التحميل والرفع وكتابات قاعدة البيانات
+        trace = tracer.start('handle_url', platform=platform, url=url, chat_id=update.effective_chat.id)
+        error = None
+        
         # إرسال رسالة جاري التحميل
-        processing_message = await update.message.reply_text(
-            "جاري معالجة الرابط... ⏳",
-            reply_to_message_id=update.message.message_id
-        )
+        with tracer.span('ack'):
+            processing_message = await update.message.reply_text(
+                "جاري معالجة الرابط... ⏳",
+                reply_to_message_id=update.message.message_id
+            )
         
         try:
-            # تحديد نوع الرابط وتحميل الفيديو
-            platform = get_platform(url)
-            
             if platform == 'unknown':
                 raise Exception("❌ عذراً، هذا الرابط غير مدعوم")
             
-            logger.info(f"Downloading from platform: {platform}")
-            logger.info(f"URL: {url}")
+            # تحويل الروابط المختصرة إلى الرابط الكامل ومعرف ثابت يستخدم لكل الذاكرات والإحصائيات
+            with stage(platform, 'resolve'):
+                url, video_id = await short_links.canonicalize(url, platform)
             
-            if platform == 'instagram':
-                filename, title = await download_instagram(url, DOWNLOAD_DIR)
-            elif platform == 'youtube':
-                filename, title = await download_youtube(url, DOWNLOAD_DIR)
-            elif platform == 'tiktok':
-                filename, title = await download_tiktok(url, DOWNLOAD_DIR)
-            elif platform == 'facebook':
-                filename, title = await download_facebook(url, DOWNLOAD_DIR)
-            elif platform == 'likee':
-                filename, title = await download_likee(url, DOWNLOAD_DIR)
-            else:
-                raise Exception("❌ عذراً، هذا الرابط غير مدعوم")
+            # الروابط دون معرف فيديو حقيقي لا تستخدم الذاكرة المؤقتة ولا دمج الطلبات حتى لا تتصادم مفاتيحها
+            cacheable = has_video_id(url, platform)
             
-            # إرسال الفيديو
-            if os.path.exists(filename):
-                with open(filename, 'rb') as video:
+            # إعادة إرسال الملف من الذاكرة المؤقتة إذا تم رفعه سابقاً
+            cached = await file_cache.get(platform, video_id, 'video') if cacheable else None
+            if cached:
+                file_id, title = cached
+                try:
                     await update.message.reply_video(
-                        video=video,
+                        video=file_id,
                         caption=f"✅ {title}",
                         reply_to_message_id=update.message.message_id
                     )
-                
-                # حذف الملف بعد الإرسال
-                os.remove(filename)
+                    await processing_message.delete()
+                    logger.info(f"Served {platform}:{video_id} from file_id cache")
+                    metrics.REQUESTS_SUCCEEDED.inc(platform=platform, source='cache')
+                    tracer.annotate(source='cache', video_id=video_id)
+                    await update_user_stats(update.effective_user, platform, url)
+                    return
+                except Exception as e:
+                    logger.warning(f"Cached file_id failed for {platform}:{video_id}: {str(e)}")
+                    await file_cache.delete(platform, video_id, 'video')
+            
+            # الطلبات المتزامنة لنفس الفيديو تنتظر تحميلاً واحداً
+            if cacheable:
+                (file_id, title), joined = await inflight_downloads.run(
+                    (platform, video_id, 'video'),
+                    download_and_send, update, platform, url, video_id
+                )
             else:
-                raise Exception("❌ فشل تحميل الفيديو")
+                file_id, title = await download_and_send(update, platform, url, video_id)
+                joined = False
+            
+            # إرسال الملف المرفوع مسبقاً للمحادثات المنتظرة
+            if joined:
+                if not file_id:
+                    raise Exception("❌ فشل تحميل الفيديو")
+                await update.message.reply_video(
+                    video=file_id,
+                    caption=f"✅ {title}",
+                    reply_to_message_id=update.message.message_id
+                )
             
             # حذف رسالة جاري المعالجة
             await processing_message.delete()
+            metrics.REQUESTS_SUCCEEDED.inc(platform=platform, source='joined' if joined else 'download')
+            tracer.annotate(source='joined' if joined else 'download', video_id=video_id)
+            await update_user_stats(update.effective_user, platform, url)
             
         except Exception as e:
+            error = e
+            metrics.REQUESTS_FAILED.inc(platform=platform, error=type(e).__name__)
             # حذف رسالة جاري المعالجة
             await processing_message.delete()
             # إرسال رسالة الخطأ
@@ -375,9 +517,13 @@ async def handle_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 str(e),
                 reply_to_message_id=update.message.message_id
             )
+        finally:
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, platform=platform)
+            tracer.finish(trace, error)
             
     except Exception as e:
         logger.error(f"Error handling URL: {str(e)}")
+        tracer.finish(trace, e)
         await update.message.reply_text(
             "❌ حدث خطأ أثناء معالجة الرابط",
             reply_to_message_id=update.message.message_id
@@ -386,7 +532,7 @@ async def handle_url(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """بداية التفاعل مع البوت"""
     user = update.effective_user
-    register_user(user.id, user.username)
+    await register_user(user.id, user.username)
     
     welcome_message = (
         f"👋 مرحباً {user.first_name}!\n\n"
@@ -428,7 +574,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "*⚠️ ملاحظات مهمة:*\n"
         "• تأكد أن الفيديو عام وليس خاص\n"
         "• بعض الفيديوهات قد تكون محمية\n"
-        "• الحد الأقصى لحجم الملف: 50MB\n\n"
+        f"• الحد الأقصى لحجم الملف: {format_size(get_max_file_size())}\n\n"
         "*🆘 للدعم والمساعدة:*\n"
         "• تواصل معنا: @hamzabot\n"
         "• قناة البوت: @your_channel"
@@ -460,7 +606,7 @@ async def button_callback(update: Update, context: CallbackContext):
             "*⚠️ ملاحظات مهمة:*\n"
             "• تأكد أن الفيديو عام وليس خاص\n"
             "• بعض الفيديوهات قد تكون محمية\n"
-            "• الحد الأقصى لحجم الملف: 50MB\n\n"
+            f"• الحد الأقصى لحجم الملف: {format_size(get_max_file_size())}\n\n"
             "*🆘 للدعم والمساعدة:*\n"
             "• تواصل معنا: @hamzabot\n"
             "• قناة البوت: @your_channel"
@@ -501,11 +647,9 @@ async def button_callback(update: Update, context: CallbackContext):
         
     elif query.data == "stats":
         # عرض إحصائيات المستخدم
-        conn = sqlite3.connect('bot.db')
-        c = conn.cursor()
-        c.execute('SELECT * FROM user_stats WHERE user_id = ?', (query.from_user.id,))
-        stats = c.fetchone()
-        conn.close()
+        await stats_buffer.flush()
+        stats = await db.get_user_stats(query.from_user.id)
+        user = await db.get_user(query.from_user.id)
         
         if stats:
             text = (
@@ -521,7 +665,7 @@ async def button_callback(update: Update, context: CallbackContext):
                 "⭐️ *نقاطك:* {points}"
             )
             
-            points = sum([stats[1], stats[2], stats[3], stats[4], stats[5], stats[6], stats[7]])
+            points = user[1] if user else 0
             level = get_user_level(points)
             
             text = text.format(level=level, points=points)
@@ -551,14 +695,7 @@ async def button_callback(update: Update, context: CallbackContext):
         rating = int(query.data.split('_')[1])
         
         # حفظ التقييم في قاعدة البيانات
-        conn = sqlite3.connect('bot.db')
-        c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS ratings
-                    (user_id INTEGER PRIMARY KEY, rating INTEGER, date TEXT)''')
-        c.execute('INSERT OR REPLACE INTO ratings VALUES (?, ?, ?)',
-                 (query.from_user.id, rating, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-        conn.commit()
-        conn.close()
+        await db.save_rating(query.from_user.id, rating, datetime.now(TIMEZONE))
         
         text = f"شكراً لك! لقد قيمت البوت {rating} ⭐️"
         await query.message.edit_text(text)
@@ -576,13 +713,13 @@ async def button_callback(update: Update, context: CallbackContext):
         
         try:
             if action == 'video':
-                print("Starting video download...")
+                logger.info("Starting video download...")
                 file_path, file_type = await download_video(url)
             else:  # audio
-                print("Starting audio download...")
+                logger.info("Starting audio download...")
                 file_path, file_type = await download_audio(url)
             
-            print(f"Download completed: {file_path}")
+            logger.info(f"Download completed: {file_path}")
             
             # التحقق من وجود الملف
             if not os.path.exists(file_path):
@@ -590,13 +727,13 @@ async def button_callback(update: Update, context: CallbackContext):
                 
             # التحقق من حجم الملف
             file_size = os.path.getsize(file_path)
-            if file_size > 50 * 1024 * 1024:  # 50 MB
+            if file_size > get_max_file_size():
                 os.remove(file_path)
-                await query.edit_message_text("❌ عذراً، حجم الملف كبير جداً (أكبر من 50 ميجابايت)")
+                await query.edit_message_text(f"❌ عذراً، حجم الملف كبير جداً (أكبر من {format_size(get_max_file_size())})")
                 return
             
             # إرسال الملف
-            with open(file_path, 'rb') as file:
+            with open_upload(file_path) as file:
                 if file_type == 'video':
                     await query.message.reply_video(
                         video=file,
@@ -610,19 +747,20 @@ async def button_callback(update: Update, context: CallbackContext):
             
             # حذف الملف بعد الإرسال
             os.remove(file_path)
-            print("File sent and cleaned up successfully")
+            logger.info("File sent and cleaned up successfully")
+            await update_user_stats(query.from_user, get_platform(url), url)
             
             # تحديث رسالة الحالة
             await query.edit_message_text("✅ تم التحميل بنجاح!")
             
         except FileNotFoundError as e:
             error_msg = f"File not found: {str(e)}"
-            print(error_msg)
+            logger.error(error_msg)
             await query.edit_message_text("❌ عذراً، حدث خطأ أثناء معالجة الملف")
             
         except Exception as e:
             error_msg = str(e)
-            print(f"Download error: {error_msg}")
+            logger.error(f"Download error: {error_msg}")
             if "too large" in error_msg.lower():
                 await query.edit_message_text("❌ عذراً، حجم الملف كبير جداً")
             else:
@@ -632,33 +770,24 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """عرض إحصائيات المستخدم"""
     try:
         user_id = update.effective_user.id
-        conn = sqlite3.connect('bot_data.db')
-        c = conn.cursor()
         
         # الحصول على عدد التحميلات
-        c.execute('''
-            SELECT COUNT(*) as downloads, platform, COUNT(*) as platform_downloads
-            FROM downloads
-            WHERE user_id = ?
-            GROUP BY platform
-        ''', (user_id,))
-        
-        stats_data = c.fetchall()
-        total_downloads = sum(row[0] for row in stats_data)
+        await stats_buffer.flush()
+        stats_data = await db.platform_counts(user_id)
+        total_downloads = sum(row[1] for row in stats_data)
         
         message = "📊 *إحصائياتك*\n\n"
         message += f"📥 مجموع التحميلات: {total_downloads}\n\n"
         
         if stats_data:
             message += "🔍 تفاصيل التحميلات:\n"
-            for _, platform, platform_downloads in stats_data:
+            for platform, platform_downloads in stats_data:
                 message += f"• {platform}: {platform_downloads} تحميل\n"
         
-        conn.close()
         await update.message.reply_text(message, parse_mode='Markdown')
         
     except Exception as e:
-        print(f"Error in stats command: {str(e)}")
+        logger.error(f"Error in stats command: {str(e)}")
         await update.message.reply_text("❌ حدث خطأ في عرض الإحصائيات")
 
 async def monthly_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -667,77 +796,31 @@ async def monthly_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
         user_id = update.effective_user.id
         current_month = datetime.now(TIMEZONE).strftime("%Y-%m")
         
-        conn = sqlite3.connect('bot_data.db')
-        c = conn.cursor()
-        
         # الحصول على إحصائيات الشهر الحالي
-        c.execute('''
-            SELECT COUNT(*) as downloads, platform, COUNT(*) as platform_downloads
-            FROM downloads
-            WHERE user_id = ? AND strftime('%Y-%m', date) = ?
-            GROUP BY platform
-        ''', (user_id, current_month))
-        
-        stats_data = c.fetchall()
-        total_downloads = sum(row[0] for row in stats_data)
+        await stats_buffer.flush()
+        stats_data = await db.platform_counts(user_id, current_month)
+        total_downloads = sum(row[1] for row in stats_data)
         
         message = f"📊 *إحصائيات شهر {current_month}*\n\n"
         message += f"📥 مجموع التحميلات: {total_downloads}\n\n"
         
         if stats_data:
             message += "🔍 تفاصيل التحميلات:\n"
-            for _, platform, platform_downloads in stats_data:
+            for platform, platform_downloads in stats_data:
                 message += f"• {platform}: {platform_downloads} تحميل\n"
         
-        conn.close()
         await update.message.reply_text(message, parse_mode='Markdown')
         
     except Exception as e:
-        print(f"Error in monthly_stats command: {str(e)}")
+        logger.error(f"Error in monthly_stats command: {str(e)}")
         await update.message.reply_text("❌ حدث خطأ في عرض إحصائيات الشهر")
 
-async def update_user_stats(user_id: int, platform: str):
-    """تحديث إحصائيات المستخدم"""
-    try:
-        conn = sqlite3.connect('bot.db')
-        c = conn.cursor()
-        
-        # التأكد من وجود سجل للمستخدم
-        c.execute('INSERT OR IGNORE INTO user_stats (user_id) VALUES (?)', (user_id,))
-        
-        # تحديث عدد التحميلات
-        c.execute('UPDATE user_stats SET downloads = downloads + 1 WHERE user_id = ?', (user_id,))
-        
-        # تحديث إحصائيات المنصة
-        platform_column = f"{platform}_downloads"
-        if platform_column in ['youtube_downloads', 'instagram_downloads', 'tiktok_downloads', 'twitter_downloads', 'facebook_downloads', 'likee_downloads']:
-            c.execute(f'UPDATE user_stats SET {platform_column} = {platform_column} + 1 WHERE user_id = ?', (user_id,))
-        
-        # تحديث إحصائيات البوت
-        today = datetime.now(TIMEZONE).strftime('%Y-%m-%d')
-        c.execute('INSERT OR IGNORE INTO bot_stats (date) VALUES (?)', (today,))
-        c.execute('UPDATE bot_stats SET total_downloads = total_downloads + 1, active_users = active_users + 1 WHERE date = ?', (today,))
-        
-        conn.commit()
-        conn.close()
-        
-        logger.info(f"Updated stats for user {user_id} - platform: {platform}")
-        
-    except Exception as e:
-        logger.error(f"Error updating user stats: {str(e)}")
-        raise
-
-def register_user(user_id: int, username: str):
-    """تسجيل مستخدم جديد في قاعدة البيانات"""
-    try:
-        conn = sqlite3.connect('bot_data.db')
-        c = conn.cursor()
-        c.execute('INSERT OR IGNORE INTO users (user_id, username) VALUES (?, ?)', (user_id, username))
-        conn.commit()
-    except Exception as e:
-        print(f"Error registering user: {str(e)}")
-    finally:
-        conn.close()
+async def update_user_stats(user, platform: str, url: str):
+    """تسجيل التحميل في مخزن الإحصائيات ليحفظ مع الدفعة التالية"""
+    stats_buffer.record(
+        user.id, user.username, platform, url,
+        POINTS_PER_DOWNLOAD, datetime.now(TIMEZONE)
+    )
 
 def ensure_permissions():
     """التأكد من وجود الصلاحيات والملفات اللازمة"""
@@ -755,79 +838,31 @@ def error_handler(update: Update, context: CallbackContext) -> None:
         text = "عذراً، حدث خطأ غير متوقع. سيتم إصلاحه قريباً."
         update.effective_message.reply_text(text)
 
-def init_db():
+async def init_db():
     """تهيئة قاعدة البيانات"""
     try:
-        conn = sqlite3.connect('bot.db')
-        c = conn.cursor()
-        
-        # جدول المستخدمين
-        c.execute('''CREATE TABLE IF NOT EXISTS users
-                    (user_id INTEGER PRIMARY KEY,
-                     username TEXT,
-                     join_date TEXT)''')
-        
-        # جدول إحصائيات المستخدمين
-        c.execute('''CREATE TABLE IF NOT EXISTS user_stats
-                    (user_id INTEGER PRIMARY KEY,
-                     downloads INTEGER DEFAULT 0,
-                     youtube_downloads INTEGER DEFAULT 0,
-                     instagram_downloads INTEGER DEFAULT 0,
-                     tiktok_downloads INTEGER DEFAULT 0,
-                     twitter_downloads INTEGER DEFAULT 0,
-                     facebook_downloads INTEGER DEFAULT 0,
-                     likee_downloads INTEGER DEFAULT 0)''')
-        
-        # جدول التقييمات
-        c.execute('''CREATE TABLE IF NOT EXISTS ratings
-                    (user_id INTEGER PRIMARY KEY,
-                     rating INTEGER,
-                     date TEXT)''')
-        
-        # جدول إحصائيات البوت
-        c.execute('''CREATE TABLE IF NOT EXISTS bot_stats
-                    (date TEXT PRIMARY KEY,
-                     total_downloads INTEGER DEFAULT 0,
-                     active_users INTEGER DEFAULT 0,
-                     new_users INTEGER DEFAULT 0)''')
-        
-        conn.commit()
-        conn.close()
+        await db.init()
+        
+        # جدول معرفات ملفات تيليجرام
+        await db.transaction(file_cache.init_table)
+        
+        # جداول البث الجماعي
+        await db.transaction(broadcaster.init_table)
+        
         logger.info("Database initialized successfully")
         
     except Exception as e:
         logger.error(f"Error initializing database: {str(e)}")
         raise
 
-def register_user(user_id: int, username: str):
+async def register_user(user_id: int, username: str):
     """تسجيل مستخدم جديد في قاعدة البيانات"""
     try:
-        conn = sqlite3.connect('bot.db')
-        c = conn.cursor()
-        
-        # التحقق من وجود المستخدم
-        c.execute('SELECT user_id FROM users WHERE user_id = ?', (user_id,))
-        existing_user = c.fetchone()
-        
-        if not existing_user:
-            # تسجيل مستخدم جديد
-            current_time = datetime.now(TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
-            c.execute('INSERT INTO users (user_id, username, join_date) VALUES (?, ?, ?)',
-                     (user_id, username, current_time))
-            
-            # تحديث إحصائيات البوت
-            today = datetime.now(TIMEZONE).strftime('%Y-%m-%d')
-            c.execute('INSERT OR IGNORE INTO bot_stats (date) VALUES (?)', (today,))
-            c.execute('UPDATE bot_stats SET new_users = new_users + 1 WHERE date = ?', (today,))
-            
+        if await db.register_user(user_id, username, datetime.now(TIMEZONE)):
             logger.info(f"New user registered: {username} (ID: {user_id})")
         
-        conn.commit()
-        conn.close()
-        
     except Exception as e:
         logger.error(f"Error registering user: {str(e)}")
-        raise
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """معالجة الأخطاء العامة"""
@@ -861,39 +896,108 @@ async def download_tiktok_video(update: Update, context: ContextTypes.DEFAULT_TY
         url = update.message.text
         await update.message.reply_text("جاري تحميل الفيديو من تيك توك...")
         
-        async with TikTokDownloader(download_dir=DOWNLOAD_DIR) as downloader:
-            video_path, video_title = await downloader.download(url)
-            
-            if video_path and os.path.exists(video_path):
+        video_path, video_title = await download_scheduler.run('tiktok', downloaders.download_tiktok, url, DOWNLOAD_DIR)
+        
+        if video_path and os.path.exists(video_path):
+            with open(video_path, 'rb') as video:
                 await update.message.reply_video(
-                    video=open(video_path, 'rb'),
+                    video=video,
                     caption=f"تم تحميل الفيديو: {video_title}",
                     supports_streaming=True
                 )
-                os.remove(video_path)  # تنظيف الملف بعد الإرسال
-            else:
-                await update.message.reply_text("عذراً، حدث خطأ أثناء تحميل الفيديو.")
+            os.remove(video_path)  # تنظيف الملف بعد الإرسال
+        else:
+            await update.message.reply_text("عذراً، حدث خطأ أثناء تحميل الفيديو.")
                 
     except Exception as e:
         await update.message.reply_text(f"عذراً، حدث خطأ: {str(e)}")
 
+async def on_startup(application: Application):
+    """تهيئة الموارد المشتركة بعد تشغيل البوت"""
+    await init_db()
+    stats_buffer.start()
+    await http_client.start_session()
+    proxy_pool.start()
+    await metrics_server.start()
+    
+    # استكمال البثوث التي انقطعت في التشغيل السابق
+    broadcaster.start(application.bot)
+    
+    logger.info(
+        f"Startup took {time.perf_counter() - STARTUP_BEGIN:.2f}s "
+        f"(imports {IMPORT_TIME:.2f}s)"
+    )
+    if PREWARM_PLATFORMS:
+        application.create_task(prewarm_platforms())
+
+async def prewarm_platforms():
+    """تحميل موديولات المنصات في خيط منفصل حتى لا ينتظرها أول طلب"""
+    started = time.perf_counter()
+    try:
+        await asyncio.to_thread(downloaders.preload)
+        logger.info(f"Platform modules preloaded in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        logger.warning(f"Error preloading platform modules: {str(e)}")
+
+async def on_shutdown(application: Application):
+    """تنظيف الموارد عند إيقاف البوت"""
+    ytdlp_runner.shutdown_executor()
+    await browser_pool.close()
+    await proxy_pool.stop()
+    await http_client.close_session()
+    await broadcaster.stop()
+    await stats_buffer.stop()
+    await db.close()
+    await metadata_cache.close()
+    await metrics_server.stop()
+
 def run_bot():
     """تشغيل البوت"""
     try:
-        # تهيئة قاعدة البيانات
-        init_db()
-        
         # التأكد من الصلاحيات
         ensure_permissions()
         
         # إنشاء التطبيق
-        application = Application.builder().token(TOKEN).build()
+        # تفعيل معالجة التحديثات بالتوازي حتى يتحكم المجدول في عدد التحميلات
+        builder = (
+            Application.builder()
+            .token(TOKEN)
+            .concurrent_updates(MAX_CONCURRENT_UPDATES)
+            .post_init(on_startup)
+            .post_shutdown(on_shutdown)
+        )
+        
+        # استخدام خادم telegram-bot-api محلي لإرسال ملفات حتى 2GB من القرص مباشرة
+        # يجب أن يشارك الخادم نفس نظام الملفات مع البوت
+        if is_local_mode():
+            builder = (
+                builder
+                .base_url(f"{LOCAL_BOT_API_URL}/bot")
+                .base_file_url(f"{LOCAL_BOT_API_URL}/file/bot")
+                .local_mode(True)
+            )
+            logger.info(f"Using local Bot API server: {LOCAL_BOT_API_URL}")
+        
+        application = builder.build()
         
         # إضافة معالجات الأوامر
         application.add_handler(CommandHandler("start", start))
         application.add_handler(CommandHandler("help", help_command))
         application.add_handler(CommandHandler("stats", stats))
         application.add_handler(CommandHandler("monthly", monthly_stats))
+        application.add_handler(CommandHandler("proxies", proxy_stats))
+        application.add_handler(CommandHandler("admin", admin_dashboard))
+        application.add_handler(CommandHandler("broadcast_monthly", broadcast_monthly))
+        
+        # جدولة الإحصائيات الشهرية (تتطلب python-telegram-bot[job-queue])
+        if application.job_queue:
+            application.job_queue.run_monthly(
+                monthly_stats_job,
+                when=dt_time(hour=12, tzinfo=datetime.now(TIMEZONE).tzinfo),
+                day=1
+            )
+        else:
+            logger.warning("JobQueue not available, use /broadcast_monthly to send monthly stats")
         
         # إضافة معالج الرسائل
         application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_url))
@@ -905,12 +1009,11 @@ def run_bot():
         application.add_error_handler(error_handler)
         
         # تشغيل البوت
-        print("جاري تشغيل البوت...".encode('utf-8').decode(sys.stdout.encoding, errors='replace'))
+        logger.info("جاري تشغيل البوت...")
         application.run_polling()
         
     except Exception as e:
-        error_msg = f"خطأ في تشغيل البوت: {str(e)}"
-        print(error_msg.encode('utf-8').decode(sys.stdout.encoding, errors='replace'))
+        logger.error(f"خطأ في تشغيل البوت: {str(e)}")
 
 def check_ffmpeg():
     """التحقق من وجود ffmpeg"""
@@ -933,6 +1036,6 @@ if __name__ == '__main__':
     try:
         run_bot()
     except KeyboardInterrupt:
-        print("\nBot stopped by user")
+        logger.info("Bot stopped by user")
     except Exception as e:
-        print(f"Error in main program: {str(e)}")
+        logger.error(f"Error in main program: {str(e)}")
@@ -0,0 +1,257 @@
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+from telegram.error import RetryAfter, Forbidden, BadRequest, TimedOut, NetworkError, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# الحد العام لعدد الرسائل في الثانية (حد تيليجرام الافتراضي حوالي 30 رسالة/ثانية)
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "25"))
+
+# عدد الرسائل المرسلة بالتوازي
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+
+# عدد المحاولات عند أخطاء الشبكة
+BROADCAST_MAX_ATTEMPTS = 3
+
+# عدد المستلمين المقروئين من قاعدة البيانات في كل دفعة
+PAGE_SIZE = 1000
+
+# عدد النتائج التي تحفظ معاً
+PROGRESS_BATCH = 500
+
+# حالات المستلم
+PENDING, SENT, FAILED = 0, 1, 2
+
+
+class TokenBucket:
+    """دلو رموز يحد عدد العمليات في الثانية مع السماح بدفعات قصيرة"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """انتظار رمز واحد"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """إيقاف الإرسال مؤقتاً بعد RetryAfter"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class Broadcaster:
+    """إرسال رسائل جماعية بتوازٍ محدود مع حفظ التقدم لاستكمال البث بعد الانقطاع"""
+
+    def __init__(self, db, rate: float = BROADCAST_RATE, concurrency: int = BROADCAST_CONCURRENCY):
+        self.db = db
+        self.rate = rate
+        self.concurrency = concurrency
+        self._running = {}
+        self._resume_task = None
+
+    def init_table(self, conn: sqlite3.Connection):
+        """إنشاء جداول البث"""
+        conn.execute('''CREATE TABLE IF NOT EXISTS broadcasts
+                    (name TEXT PRIMARY KEY,
+                     parse_mode TEXT,
+                     created_at REAL,
+                     finished_at REAL)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS broadcast_recipients
+                    (name TEXT,
+                     chat_id INTEGER,
+                     text TEXT,
+                     status INTEGER DEFAULT 0,
+                     error TEXT,
+                     PRIMARY KEY (name, chat_id))''')
+
+    @staticmethod
+    def _create(conn: sqlite3.Connection, name: str, messages: list, parse_mode: str) -> bool:
+        cursor = conn.execute('INSERT OR IGNORE INTO broadcasts (name, parse_mode, created_at) VALUES (?, ?, ?)',
+                              (name, parse_mode, time.time()))
+        if cursor.rowcount == 0:
+            return False
+        conn.executemany('INSERT OR IGNORE INTO broadcast_recipients (name, chat_id, text) VALUES (?, ?, ?)',
+                         ((name, chat_id, text) for chat_id, text in messages))
+        return True
+
+    async def create(self, name: str, messages: list, parse_mode: str = None) -> bool:
+        """تسجيل بث جديد من قائمة (chat_id, text)، وإرجاع False إذا كان مسجلاً مسبقاً"""
+        return await self.db.transaction(self._create, name, messages, parse_mode)
+
+    async def exists(self, name: str) -> bool:
+        return await self.db.fetchone('SELECT 1 FROM broadcasts WHERE name = ?', (name,)) is not None
+
+    async def progress(self, name: str) -> dict:
+        """عدد المستلمين في كل حالة"""
+        rows = await self.db.fetchall('SELECT status, COUNT(*) FROM broadcast_recipients WHERE name = ? GROUP BY status',
+                                      (name,))
+        counts = dict(rows)
+        return {'pending': counts.get(PENDING, 0), 'sent': counts.get(SENT, 0), 'failed': counts.get(FAILED, 0)}
+
+    async def unfinished(self) -> list:
+        """أسماء البثوث التي لم تكتمل"""
+        rows = await self.db.fetchall('SELECT name FROM broadcasts WHERE finished_at IS NULL ORDER BY created_at')
+        return [row[0] for row in rows]
+
+    async def _send(self, bot, bucket: TokenBucket, chat_id: int, text: str, parse_mode: str) -> tuple:
+        """إرسال رسالة واحدة وإرجاع (الحالة، الخطأ)"""
+        attempts = 0
+        while True:
+            await bucket.acquire()
+            try:
+                await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+                return SENT, None
+            except RetryAfter as e:
+                # تيليجرام يطلب إيقاف الإرسال، نوقف جميع العمال
+                retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+                logger.warning(f"Broadcast flood limit, pausing {retry_after}s")
+                bucket.pause(retry_after)
+            except (Forbidden, BadRequest) as e:
+                # المستخدم حظر البوت أو المحادثة غير موجودة
+                return FAILED, str(e)
+            except (TimedOut, NetworkError) as e:
+                attempts += 1
+                if attempts >= BROADCAST_MAX_ATTEMPTS:
+                    return FAILED, str(e)
+                await asyncio.sleep(2 ** attempts)
+            except TelegramError as e:
+                # أي خطأ آخر من تيليجرام يخص هذا المستلم فقط
+                return FAILED, str(e)
+
+    async def _save(self, results: list):
+        if results:
+            await self.db.transaction(
+                lambda conn: conn.executemany(
+                    'UPDATE broadcast_recipients SET status = ?, error = ? WHERE name = ? AND chat_id = ?', results
+                )
+            )
+
+    async def run(self, bot, name: str) -> dict:
+        """إرسال الرسائل المعلقة في البث واستكماله من حيث توقف"""
+        task = self._running.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._run(bot, name))
+            self._running[name] = task
+            task.add_done_callback(lambda _: self._running.pop(name, None))
+        return await asyncio.shield(task)
+
+    async def resume_all(self, bot):
+        """استكمال البثوث التي انقطعت عند إيقاف البوت"""
+        for name in await self.unfinished():
+            logger.info(f"Resuming broadcast {name}")
+            try:
+                await self.run(bot, name)
+            except Exception as e:
+                logger.error(f"Error resuming broadcast {name}: {str(e)}")
+
+    def start(self, bot):
+        """استكمال البثوث المنقطعة في الخلفية دون تأخير إيقاف البوت"""
+        if self._resume_task is None or self._resume_task.done():
+            self._resume_task = asyncio.create_task(self.resume_all(bot))
+
+    async def stop(self):
+        """إيقاف البثوث الجارية مع حفظ تقدمها"""
+        if self._resume_task:
+            self._resume_task.cancel()
+            self._resume_task = None
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, bot, name: str) -> dict:
+        row = await self.db.fetchone('SELECT parse_mode FROM broadcasts WHERE name = ?', (name,))
+        if row is None:
+            raise KeyError(name)
+        parse_mode = row[0]
+
+        bucket = TokenBucket(self.rate)
+        queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        results = []
+        started = time.monotonic()
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                chat_id, text = item
+                status, error = await self._send(bot, bucket, chat_id, text, parse_mode)
+                results.append((status, error, name, chat_id))
+                if len(results) >= PROGRESS_BATCH:
+                    batch = results[:]
+                    results.clear()
+                    try:
+                        await self._save(batch)
+                    except Exception as e:
+                        # إعادة النتائج لحفظها مع الدفعة التالية
+                        logger.error(f"Error saving broadcast {name} progress: {str(e)}")
+                        results.extend(batch)
+
+        def check_workers():
+            """إيقاف البث إذا توقف أحد العمال بخطأ بدلاً من انتظار الطابور للأبد"""
+            for task in workers:
+                if task.done() and not task.cancelled() and task.exception():
+                    raise task.exception()
+
+        async def put(item):
+            """إضافة عنصر للطابور مع مراقبة العمال أثناء الانتظار"""
+            while True:
+                check_workers()
+                if not queue.full():
+                    queue.put_nowait(item)
+                    return
+                putter = asyncio.ensure_future(queue.put(item))
+                alive = [task for task in workers if not task.done()]
+                await asyncio.wait([putter, *alive], return_when=asyncio.FIRST_COMPLETED)
+                if putter.done():
+                    return
+                putter.cancel()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            last_chat_id = None
+            while True:
+                # قراءة المستلمين المعلقين على صفحات حسب chat_id
+                page = await self.db.fetchall(
+                    '''SELECT chat_id, text FROM broadcast_recipients
+                       WHERE name = ? AND status = ? AND chat_id > ?
+                       ORDER BY chat_id LIMIT ?''',
+                    (name, PENDING, last_chat_id if last_chat_id is not None else -2 ** 63, PAGE_SIZE)
+                )
+                if not page:
+                    break
+                for item in page:
+                    await put(item)
+                last_chat_id = page[-1][0]
+            for _ in workers:
+                await put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            await self._save(results)
+
+        await self.db.execute('UPDATE broadcasts SET finished_at = ? WHERE name = ?', (time.time(), name))
+        progress = await self.progress(name)
+        logger.info(f"Broadcast {name} finished in {time.monotonic() - started:.1f}s: {progress}")
+        return progress
@@ -0,0 +1,138 @@
+import os
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PooledBrowser:
+    """متصفح داخل المجمع مع بيانات الاستخدام"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+
+
+class BrowserPool:
+    """مجمع متصفحات Chrome بدون واجهة تبقى جاهزة بين الطلبات"""
+
+    def __init__(self, max_size: int = 2, idle_timeout: float = 300, max_uses: int = 100):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_uses = max_uses
+        self._idle = []
+        self._slots = asyncio.Semaphore(max_size)
+        self._reaper = None
+        self.created = 0
+        self.restarted = 0
+
+    @staticmethod
+    def _create_driver():
+        """تشغيل متصفح جديد (عملية متزامنة)"""
+        # المكتبة ثقيلة، تحمل عند تشغيل أول متصفح فقط
+        import undetected_chromedriver as uc
+        options = uc.ChromeOptions()
+        options.add_argument('--headless')  # تشغيل المتصفح بدون واجهة
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        return uc.Chrome(options=options)
+
+    @staticmethod
+    def _quit_driver(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Error closing browser: {str(e)}")
+
+    @staticmethod
+    def _is_alive(driver) -> bool:
+        """التحقق من أن المتصفح لم يتوقف"""
+        try:
+            driver.window_handles
+            return True
+        except Exception:
+            return False
+
+    def _ensure_reaper(self):
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.create_task(self._reap_idle())
+
+    async def _reap_idle(self):
+        """إغلاق المتصفحات الخاملة لفترة طويلة"""
+        while True:
+            await asyncio.sleep(self.idle_timeout / 2)
+            now = time.monotonic()
+            # إخراج المتصفحات المنتهية من القائمة قبل أي انتظار حتى لا يحجزها acquire أثناء إغلاقها
+            expired = [b for b in self._idle if now - b.last_used > self.idle_timeout]
+            self._idle = [b for b in self._idle if b not in expired]
+            for browser in expired:
+                logger.info("Recycling idle browser")
+                await asyncio.to_thread(self._quit_driver, browser.driver)
+
+    async def acquire(self) -> PooledBrowser:
+        """حجز متصفح جاهز أو تشغيل متصفح جديد"""
+        await self._slots.acquire()
+        try:
+            self._ensure_reaper()
+            while self._idle:
+                browser = self._idle.pop()
+                if await asyncio.to_thread(self._is_alive, browser.driver):
+                    return browser
+                # المتصفح توقف، نستبدله بمتصفح جديد
+                self.restarted += 1
+                logger.warning("Pooled browser crashed, replacing it")
+                await asyncio.to_thread(self._quit_driver, browser.driver)
+
+            driver = await asyncio.to_thread(self._create_driver)
+            self.created += 1
+            return PooledBrowser(driver)
+        except Exception:
+            self._slots.release()
+            raise
+
+    async def release(self, browser: PooledBrowser, healthy: bool = True):
+        """إعادة المتصفح إلى المجمع أو إغلاقه"""
+        try:
+            browser.uses += 1
+            browser.last_used = time.monotonic()
+            if healthy and browser.uses < self.max_uses:
+                self._idle.append(browser)
+            else:
+                await asyncio.to_thread(self._quit_driver, browser.driver)
+        finally:
+            self._slots.release()
+
+    async def run(self, func, *args):
+        """تشغيل دالة متزامنة تستقبل المتصفح في خيط منفصل"""
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        browser = await self.acquire()
+        healthy = True
+        try:
+            return await asyncio.to_thread(func, browser.driver, *args)
+        except TimeoutException:
+            raise
+        except WebDriverException:
+            healthy = False
+            raise
+        finally:
+            await self.release(browser, healthy)
+
+    async def close(self):
+        """إغلاق جميع المتصفحات"""
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+        idle, self._idle = self._idle, []
+        for browser in idle:
+            await asyncio.to_thread(self._quit_driver, browser.driver)
+
+
+# المجمع المشترك
+browser_pool = BrowserPool(
+    max_size=int(os.getenv("BROWSER_POOL_SIZE", "2")),
+    idle_timeout=float(os.getenv("BROWSER_IDLE_TIMEOUT", "300")),
+    max_uses=int(os.getenv("BROWSER_MAX_USES", "100"))
+)
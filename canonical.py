@@ -0,0 +1,67 @@
+import re
+import urllib.parse
+
+# أنماط استخراج معرف الفيديو الثابت لكل منصة
+VIDEO_ID_PATTERNS = {
+    'youtube': [
+        re.compile(r'[?&]v=([\w-]{11})'),
+        re.compile(r'youtu\.be/([\w-]{11})'),
+        re.compile(r'youtube\.com/(?:shorts|embed|live|v)/([\w-]{11})'),
+    ],
+    'instagram': [
+        re.compile(r'instagram\.com/(?:[\w\.]+/)?(?:p|reel|reels|tv)/([\w-]+)'),
+        re.compile(r'instagram\.com/stories/[\w\.]+/(\d+)'),
+    ],
+    'tiktok': [
+        re.compile(r'/video/(\d+)'),
+        re.compile(r'tiktok\.com/v/(\d+)'),
+    ],
+    'facebook': [
+        re.compile(r'/videos/(?:[^/]+/)?(\d+)'),
+        re.compile(r'[?&]v=(\d+)'),
+        re.compile(r'/reel/(\d+)'),
+    ],
+    # البادئة إلزامية حتى لا تعتبر صفحات مثل likee.video/trending معرفات فيديو
+    'likee': [
+        re.compile(r'(?:likee|like)\.video/(?:@[\w\.-]+/video/|v/)(\w+)'),
+    ],
+    'twitter': [
+        re.compile(r'/status/(\d+)'),
+    ],
+}
+
+# معاملات الاستعلام التي تحدد المحتوى ولا يجوز حذفها من الرابط الموحد
+SIGNIFICANT_PARAMS = ('story_fbid', 'fbid', 'id', 'v', 'list')
+
+
+def normalize_url(url: str) -> str:
+    """توحيد شكل الرابط بإزالة المعاملات والأجزاء غير المهمة مع الإبقاء على معاملات المحتوى"""
+    url = url.strip()
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    parsed = urllib.parse.urlparse(url)
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    params = sorted((k, v) for k, v in urllib.parse.parse_qsl(parsed.query) if k in SIGNIFICANT_PARAMS)
+    query = f"?{urllib.parse.urlencode(params)}" if params else ''
+    return f"https://{host}{parsed.path.rstrip('/')}{query}"
+
+
+def extract_video_id(url: str, platform: str) -> str:
+    """استخراج معرف الفيديو الثابت من الرابط أو None إذا لم يطابق أي نمط"""
+    for pattern in VIDEO_ID_PATTERNS.get(platform, []):
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
+    return None
+
+
+def has_video_id(url: str, platform: str) -> bool:
+    """هل يحتوي الرابط على معرف فيديو حقيقي يصلح مفتاحاً للذاكرات المؤقتة ودمج الطلبات"""
+    return extract_video_id(url, platform) is not None
+
+
+def get_video_id(url: str, platform: str) -> str:
+    """استخراج معرف الفيديو الثابت من الرابط أو إرجاع الرابط الموحد"""
+    return extract_video_id(url, platform) or normalize_url(url)
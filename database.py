@@ -0,0 +1,341 @@
+import os
+import asyncio
+import logging
+import sqlite3
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import DB_WRITE_SECONDS
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# مسار قاعدة البيانات الموحدة
+DATABASE_PATH = os.getenv("DATABASE_PATH", "bot.db")
+
+# عدد الاستعلامات المحضرة التي يحتفظ بها الاتصال
+STATEMENT_CACHE_SIZE = 256
+
+# عدد المستخدمين المحفوظين في لوحة المتصدرين
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", "10"))
+
+PLATFORM_COLUMNS = {
+    'youtube': 'youtube_downloads',
+    'instagram': 'instagram_downloads',
+    'tiktok': 'tiktok_downloads',
+    'twitter': 'twitter_downloads',
+    'facebook': 'facebook_downloads',
+    'likee': 'likee_downloads',
+}
+
+SCHEMA = [
+    # جدول المستخدمين
+    '''CREATE TABLE IF NOT EXISTS users
+       (user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        join_date TEXT,
+        points INTEGER DEFAULT 0,
+        downloads INTEGER DEFAULT 0)''',
+
+    # سجل التحميلات
+    '''CREATE TABLE IF NOT EXISTS downloads
+       (id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        platform TEXT,
+        url TEXT,
+        date TEXT,
+        month TEXT,
+        points INTEGER DEFAULT 0)''',
+
+    # ملخص شهري لكل مستخدم ومنصة يحدث مع كل دفعة تحميلات
+    '''CREATE TABLE IF NOT EXISTS monthly_rollup
+       (user_id INTEGER,
+        month TEXT,
+        platform TEXT,
+        downloads INTEGER DEFAULT 0,
+        points INTEGER DEFAULT 0,
+        PRIMARY KEY (user_id, month, platform))''',
+
+    # جدول إحصائيات المستخدمين
+    '''CREATE TABLE IF NOT EXISTS user_stats
+       (user_id INTEGER PRIMARY KEY,
+        downloads INTEGER DEFAULT 0,
+        youtube_downloads INTEGER DEFAULT 0,
+        instagram_downloads INTEGER DEFAULT 0,
+        tiktok_downloads INTEGER DEFAULT 0,
+        twitter_downloads INTEGER DEFAULT 0,
+        facebook_downloads INTEGER DEFAULT 0,
+        likee_downloads INTEGER DEFAULT 0)''',
+
+    # عدادات إجمالية تحدث مع كل تسجيل أو تحميل
+    '''CREATE TABLE IF NOT EXISTS counters
+       (name TEXT PRIMARY KEY,
+        value INTEGER DEFAULT 0)''',
+
+    # أكثر المستخدمين تحميلاً
+    '''CREATE TABLE IF NOT EXISTS leaderboard
+       (user_id INTEGER PRIMARY KEY,
+        username TEXT,
+        downloads INTEGER,
+        points INTEGER)''',
+
+    # جدول التقييمات
+    '''CREATE TABLE IF NOT EXISTS ratings
+       (user_id INTEGER PRIMARY KEY,
+        rating INTEGER,
+        date TEXT)''',
+
+    # جدول إحصائيات البوت
+    '''CREATE TABLE IF NOT EXISTS bot_stats
+       (date TEXT PRIMARY KEY,
+        total_downloads INTEGER DEFAULT 0,
+        active_users INTEGER DEFAULT 0,
+        new_users INTEGER DEFAULT 0)''',
+]
+
+# أعمدة أضيفت لاحقاً إلى الجداول في قواعد البيانات القديمة
+MIGRATED_COLUMNS = {
+    'users': {
+        'points': 'INTEGER DEFAULT 0',
+        'downloads': 'INTEGER DEFAULT 0',
+    },
+    'downloads': {
+        'month': 'TEXT',
+    },
+}
+
+# الفهارس تنشأ بعد إضافة الأعمدة الناقصة
+INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_downloads_user_month ON downloads (user_id, month)',
+    'CREATE INDEX IF NOT EXISTS idx_downloads_date ON downloads (date)',
+    'CREATE INDEX IF NOT EXISTS idx_monthly_rollup_month ON monthly_rollup (month, user_id)',
+    'CREATE INDEX IF NOT EXISTS idx_leaderboard_downloads ON leaderboard (downloads)',
+]
+
+
+class Database:
+    """قاعدة SQLite واحدة باتصال دائم يعمل على خيط مخصص حتى لا تعطل حلقة الأحداث"""
+
+    def __init__(self, path: str = DATABASE_PATH):
+        self.path = path
+        self._conn = None
+        self._executor = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def _run(self, func, *args):
+        """تنفيذ الدالة على خيط قاعدة البيانات (يستدعى داخل الخيط فقط)"""
+        if self._conn is None:
+            self._conn = self._connect()
+        return func(self._conn, *args)
+
+    def _run_transaction(self, func, *args):
+        def wrapper(conn, *args):
+            with conn:
+                return func(conn, *args)
+        return self._run(wrapper, *args)
+
+    async def _submit(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sqlite')
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def call(self, func, *args):
+        """تشغيل func(conn, *args) على خيط قاعدة البيانات"""
+        return await self._submit(self._run, func, *args)
+
+    async def transaction(self, func, *args):
+        """تشغيل func(conn, *args) داخل معاملة واحدة"""
+        operation = func.__name__.strip('_<>')
+        with DB_WRITE_SECONDS.time(operation=operation), tracer.span(f"db.{operation}"):
+            return await self._submit(self._run_transaction, func, *args)
+
+    async def execute(self, sql: str, params: tuple = ()):
+        """تنفيذ استعلام كتابة وحفظه"""
+        def execute(conn):
+            conn.execute(sql, params)
+        await self.transaction(execute)
+
+    async def fetchone(self, sql: str, params: tuple = ()):
+        return await self.call(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetchall(self, sql: str, params: tuple = ()):
+        return await self.call(lambda conn: conn.execute(sql, params).fetchall())
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection):
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for statement in SCHEMA:
+            conn.execute(statement)
+        for table, columns in MIGRATED_COLUMNS.items():
+            existing = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+            for column, definition in columns.items():
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+        # تعبئة مفتاح الشهر والملخص الشهري للسجلات القديمة
+        conn.execute('UPDATE downloads SET month = substr(date, 1, 7) WHERE month IS NULL')
+        if 'monthly_rollup' not in tables:
+            conn.execute('''INSERT INTO monthly_rollup (user_id, month, platform, downloads, points)
+                            SELECT user_id, month, platform, COUNT(*), COALESCE(SUM(points), 0)
+                            FROM downloads GROUP BY user_id, month, platform''')
+        if 'counters' not in tables:
+            conn.execute('''INSERT INTO counters (name, value) VALUES
+                            ('total_users', (SELECT COUNT(*) FROM users)),
+                            ('total_downloads', (SELECT COUNT(*) FROM downloads))''')
+        if 'leaderboard' not in tables:
+            conn.execute('''INSERT INTO leaderboard (user_id, username, downloads, points)
+                            SELECT user_id, username, downloads, points FROM users
+                            ORDER BY downloads DESC LIMIT ?''', (LEADERBOARD_SIZE,))
+
+        for statement in INDEXES:
+            conn.execute(statement)
+
+    async def init(self):
+        """فتح الاتصال وإنشاء الجداول"""
+        await self.transaction(self._create_schema)
+        logger.info(f"Database ready: {self.path}")
+
+    async def close(self):
+        """إغلاق الاتصال وإيقاف خيط قاعدة البيانات"""
+        if self._executor is None:
+            return
+        def close(conn):
+            conn.close()
+            self._conn = None
+        if self._conn is not None:
+            await self.call(close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+
+    # ===== المستخدمون =====
+
+    @staticmethod
+    def _register_user(conn, user_id: int, username: str, now: datetime) -> bool:
+        cursor = conn.execute('INSERT OR IGNORE INTO users (user_id, username, join_date) VALUES (?, ?, ?)',
+                              (user_id, username, now.strftime('%Y-%m-%d %H:%M:%S')))
+        if cursor.rowcount == 0:
+            conn.execute('UPDATE users SET username = ? WHERE user_id = ? AND username IS NOT ?',
+                         (username, user_id, username))
+            return False
+        today = now.strftime('%Y-%m-%d')
+        conn.execute('INSERT OR IGNORE INTO bot_stats (date) VALUES (?)', (today,))
+        conn.execute('UPDATE bot_stats SET new_users = new_users + 1 WHERE date = ?', (today,))
+        Database._increment(conn, 'total_users', 1)
+        return True
+
+    @staticmethod
+    def _increment(conn, name: str, amount: int):
+        conn.execute('''INSERT INTO counters (name, value) VALUES (?, ?)
+                        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value''', (name, amount))
+
+    @staticmethod
+    def _update_leaderboard(conn, user_id: int):
+        """إدخال المستخدم في لوحة المتصدرين إذا تجاوز أقل عدد فيها (التحميلات لا تنقص أبداً)"""
+        username, downloads, points = conn.execute(
+            'SELECT username, downloads, points FROM users WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        if conn.execute('UPDATE leaderboard SET username = ?, downloads = ?, points = ? WHERE user_id = ?',
+                        (username, downloads, points, user_id)).rowcount:
+            return
+        size, lowest = conn.execute('SELECT COUNT(*), MIN(downloads) FROM leaderboard').fetchone()
+        if size < LEADERBOARD_SIZE:
+            conn.execute('INSERT INTO leaderboard VALUES (?, ?, ?, ?)', (user_id, username, downloads, points))
+        elif downloads > lowest:
+            conn.execute('''DELETE FROM leaderboard WHERE user_id =
+                            (SELECT user_id FROM leaderboard ORDER BY downloads ASC LIMIT 1)''')
+            conn.execute('INSERT INTO leaderboard VALUES (?, ?, ?, ?)', (user_id, username, downloads, points))
+
+    async def register_user(self, user_id: int, username: str, now: datetime) -> bool:
+        """تسجيل المستخدم وإرجاع True إذا كان جديداً"""
+        return await self.transaction(self._register_user, user_id, username, now)
+
+    async def get_user(self, user_id: int):
+        """إرجاع (username, points, downloads) أو None"""
+        return await self.fetchone('SELECT username, points, downloads FROM users WHERE user_id = ?', (user_id,))
+
+    async def get_user_stats(self, user_id: int):
+        """إرجاع صف user_stats للمستخدم أو None"""
+        return await self.fetchone('SELECT * FROM user_stats WHERE user_id = ?', (user_id,))
+
+    # ===== التحميلات =====
+
+    @staticmethod
+    def _apply_stats(conn, batch):
+        conn.executemany('INSERT INTO downloads (user_id, platform, url, date, month, points) VALUES (?, ?, ?, ?, ?, ?)',
+                         batch.downloads)
+        conn.executemany('''INSERT INTO monthly_rollup (user_id, month, platform, downloads, points)
+                            VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT (user_id, month, platform) DO UPDATE SET
+                            downloads = downloads + excluded.downloads,
+                            points = points + excluded.points''',
+                         [(*key, downloads, points) for key, (downloads, points) in batch.rollup.items()])
+
+        for user_id, delta in batch.users.items():
+            Database._register_user(conn, user_id, delta.username, delta.first_seen)
+            conn.execute('UPDATE users SET downloads = downloads + ?, points = points + ? WHERE user_id = ?',
+                         (delta.downloads, delta.points, user_id))
+            Database._update_leaderboard(conn, user_id)
+
+            conn.execute('INSERT OR IGNORE INTO user_stats (user_id) VALUES (?)', (user_id,))
+            assignments = ['downloads = downloads + ?']
+            params = [delta.downloads]
+            for platform, count in sorted(delta.platforms.items()):
+                column = PLATFORM_COLUMNS.get(platform)
+                if column:
+                    assignments.append(f'{column} = {column} + ?')
+                    params.append(count)
+            conn.execute(f'UPDATE user_stats SET {", ".join(assignments)} WHERE user_id = ?', (*params, user_id))
+
+        Database._increment(conn, 'total_downloads', len(batch.downloads))
+
+        for day, count in batch.days.items():
+            conn.execute('INSERT OR IGNORE INTO bot_stats (date) VALUES (?)', (day,))
+            conn.execute('UPDATE bot_stats SET total_downloads = total_downloads + ?, active_users = active_users + ? WHERE date = ?',
+                         (count, count, day))
+
+    async def apply_stats(self, batch):
+        """حفظ دفعة من تحديثات الإحصائيات (StatsBatch) في معاملة واحدة"""
+        await self.transaction(self._apply_stats, batch)
+
+    async def platform_counts(self, user_id: int, month: str = None) -> list:
+        """عدد تحميلات المستخدم لكل منصة، لكل الوقت أو لشهر محدد (YYYY-MM)"""
+        if month:
+            return await self.fetchall('''SELECT platform, downloads FROM monthly_rollup
+                                          WHERE user_id = ? AND month = ?''', (user_id, month))
+        return await self.fetchall('''SELECT platform, SUM(downloads) FROM monthly_rollup
+                                      WHERE user_id = ? GROUP BY platform''', (user_id,))
+
+    async def monthly_summary(self, month: str) -> list:
+        """(user_id, downloads, points) لكل مستخدم في الشهر"""
+        return await self.fetchall('''SELECT user_id, SUM(downloads), SUM(points) FROM monthly_rollup
+                                      WHERE month = ? GROUP BY user_id''', (month,))
+
+    async def dashboard(self, since: datetime) -> dict:
+        """الإحصائيات العامة للوحة التحكم، والتحميلات منذ since بنفس توقيت سجل التحميلات"""
+        def run(conn):
+            return {
+                **dict(conn.execute("SELECT name, value FROM counters WHERE name IN ('total_users', 'total_downloads')")),
+                'downloads_24h': conn.execute(
+                    'SELECT COUNT(*) FROM downloads WHERE date >= ?', (since.strftime('%Y-%m-%d %H:%M:%S'),)
+                ).fetchone()[0],
+                'top_users': conn.execute(
+                    'SELECT username, downloads, points FROM leaderboard ORDER BY downloads DESC LIMIT 5'
+                ).fetchall(),
+            }
+        return await self.call(run)
+
+    # ===== التقييمات =====
+
+    async def save_rating(self, user_id: int, rating: int, now: datetime):
+        await self.execute('INSERT OR REPLACE INTO ratings VALUES (?, ?, ?)',
+                           (user_id, rating, now.strftime('%Y-%m-%d %H:%M:%S')))
+
+
+# قاعدة البيانات المشتركة
+db = Database()
@@ -2,22 +2,14 @@ import os
 import logging
 from datetime import datetime
 import yt_dlp
-import re
+from . import ytdlp_runner
+from .registry import registry
 
 logger = logging.getLogger(__name__)
 
 def is_valid_facebook_url(url: str) -> bool:
     """التحقق من صحة رابط فيسبوك"""
-    patterns = [
-        r'https?://(?:www\.)?facebook\.com/[^/]+/videos/\d+',
-        r'https?://(?:www\.)?facebook\.com/watch/\?v=\d+',
-        r'https?://(?:www\.)?facebook\.com/\w+/posts/\d+',
-        r'https?://(?:www\.)?facebook\.com/share/[^/]+/\d+',
-        r'https?://(?:www\.)?facebook\.com/share/[^/]+',
-        r'https?://(?:www\.)?fb\.watch/[^/]+',
-        r'https?://(?:www\.)?fb\.com/[^/]+'
-    ]
-    return any(re.match(pattern, url) for pattern in patterns)
+    return registry.is_supported('facebook', url)
 
 async def download_facebook(url: str, download_dir: str) -> tuple:
     """تحميل الفيديو من فيسبوك باستخدام yt-dlp"""
@@ -61,62 +53,45 @@ async def download_facebook(url: str, download_dir: str) -> tuple:
             'concurrent_fragment_downloads': 1,
             'buffersize': 1024,
             'external_downloader_args': ['-timeout', '30'],
-            'force_generic_extractor': False,
-            'sleep_interval': 3,
-            'max_sleep_interval': 10,
-            'sleep_interval_requests': 1
+            'force_generic_extractor': False
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            try:
-                # استخراج معلومات الفيديو
-                logger.info("جاري استخراج معلومات الفيديو...")
-                info = ydl.extract_info(url, download=False)
-                
-                if not info:
-                    raise Exception("لم يتم العثور على الفيديو")
-                
-                # التحقق من حجم الفيديو
-                filesize = info.get('filesize', 0)
-                if filesize and filesize > 50 * 1024 * 1024:  # 50MB
-                    raise Exception("حجم الفيديو كبير جداً")
-                
-                # تحميل الفيديو
-                logger.info("جاري تحميل الفيديو...")
-                ydl.download([url])
-                
-                # الحصول على اسم الملف
-                filename = ydl.prepare_filename(info)
-                if not os.path.exists(filename):
-                    raise Exception("فشل تحميل الفيديو")
-                
-                # استخراج العنوان
-                title = info.get('title', '')
+        try:
+            # تحميل الفيديو بأفضل صيغة ضمن الحد المسموح
+            logger.info("جاري تحميل الفيديو...")
+            filename, info = await ytdlp_runner.download_within_limit(ydl_opts, url, 'facebook')
+
+            # الحصول على اسم الملف
+            if not os.path.exists(filename):
+                raise Exception("فشل تحميل الفيديو")
+            
+            # استخراج العنوان
+            title = info.get('title', '')
+            if not title:
+                title = info.get('description', '')
                 if not title:
-                    title = info.get('description', '')
-                    if not title:
-                        title = os.path.splitext(os.path.basename(filename))[0]
-                    elif len(title) > 100:  # تقصير الوصف إذا كان طويلاً
-                        title = title[:97] + '...'
-                
-                logger.info(f"تم تحميل الفيديو بنجاح: {filename}")
-                return filename, title
-                
-            except yt_dlp.utils.DownloadError as e:
-                error_msg = str(e).lower()
-                logger.error(f"خطأ في تحميل الفيديو: {error_msg}")
+                    title = os.path.splitext(os.path.basename(filename))[0]
+                elif len(title) > 100:  # تقصير الوصف إذا كان طويلاً
+                    title = title[:97] + '...'
+            
+            logger.info(f"تم تحميل الفيديو بنجاح: {filename}")
+            return filename, title
+            
+        except yt_dlp.utils.DownloadError as e:
+            error_msg = str(e).lower()
+            logger.error(f"خطأ في تحميل الفيديو: {error_msg}")
+            
+            if 'private' in error_msg:
+                raise Exception("هذا الفيديو خاص")
+            elif 'not found' in error_msg or '404' in error_msg:
+                raise Exception("الفيديو غير موجود")
+            elif 'removed' in error_msg:
+                raise Exception("تم حذف الفيديو")
+            elif 'login' in error_msg:
+                raise Exception("يجب تسجيل الدخول لمشاهدة هذا الفيديو")
+            else:
+                raise Exception(f"خطأ في التحميل: {str(e)}")
                 
-                if 'private' in error_msg:
-                    raise Exception("هذا الفيديو خاص")
-                elif 'not found' in error_msg or '404' in error_msg:
-                    raise Exception("الفيديو غير موجود")
-                elif 'removed' in error_msg:
-                    raise Exception("تم حذف الفيديو")
-                elif 'login' in error_msg:
-                    raise Exception("يجب تسجيل الدخول لمشاهدة هذا الفيديو")
-                else:
-                    raise Exception(f"خطأ في التحميل: {str(e)}")
-                    
     except Exception as e:
         logger.error(f"خطأ في تحميل فيديو فيسبوك: {str(e)}")
         # تنظيف الملفات المؤقتة في حالة الفشل
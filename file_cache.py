@@ -0,0 +1,75 @@
+import time
+import logging
+import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# مدة صلاحية معرف الملف في الذاكرة المؤقتة (بالثواني)
+DEFAULT_TTL = 30 * 24 * 3600
+
+# الحد الأقصى لعدد العناصر المخزنة
+DEFAULT_MAX_ENTRIES = 50000
+
+
+class FileIdCache:
+    """ذاكرة مؤقتة دائمة لمعرفات ملفات تيليجرام حسب (المنصة، معرف الفيديو، الصيغة)"""
+
+    def __init__(self, db, ttl: int = DEFAULT_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.db = db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def init_table(self, conn: sqlite3.Connection):
+        """إنشاء جدول الذاكرة المؤقتة"""
+        conn.execute('''CREATE TABLE IF NOT EXISTS file_cache
+                    (platform TEXT,
+                     video_id TEXT,
+                     format TEXT,
+                     file_id TEXT NOT NULL,
+                     title TEXT,
+                     file_size INTEGER,
+                     created_at REAL,
+                     last_used REAL,
+                     PRIMARY KEY (platform, video_id, format))''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_file_cache_last_used ON file_cache (last_used)')
+
+    def _get(self, conn: sqlite3.Connection, platform: str, video_id: str, fmt: str, now: float):
+        row = conn.execute('SELECT file_id, title, created_at FROM file_cache WHERE platform = ? AND video_id = ? AND format = ?',
+                           (platform, video_id, fmt)).fetchone()
+        if not row or now - row[2] > self.ttl:
+            return None
+        conn.execute('UPDATE file_cache SET last_used = ? WHERE platform = ? AND video_id = ? AND format = ?',
+                     (now, platform, video_id, fmt))
+        return row[0], row[1]
+
+    async def get(self, platform: str, video_id: str, fmt: str = 'video'):
+        """إرجاع (file_id, title) إذا كان موجوداً وصالحاً"""
+        cached = await self.db.transaction(self._get, platform, video_id, fmt, time.time())
+        if cached:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return cached
+
+    def _set(self, conn: sqlite3.Connection, row: tuple, now: float):
+        conn.execute('INSERT OR REPLACE INTO file_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)', row)
+        self._evict(conn, now)
+
+    async def set(self, platform: str, video_id: str, fmt: str, file_id: str, title: str = None, file_size: int = None):
+        """تخزين معرف الملف بعد أول رفع"""
+        now = time.time()
+        await self.db.transaction(self._set, (platform, video_id, fmt, file_id, title, file_size, now, now), now)
+
+    async def delete(self, platform: str, video_id: str, fmt: str = 'video'):
+        """حذف عنصر لم يعد صالحاً"""
+        await self.db.execute('DELETE FROM file_cache WHERE platform = ? AND video_id = ? AND format = ?',
+                              (platform, video_id, fmt))
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """حذف العناصر المنتهية والأقل استخداماً عند تجاوز الحد"""
+        conn.execute('DELETE FROM file_cache WHERE created_at < ?', (now - self.ttl,))
+        conn.execute('''DELETE FROM file_cache WHERE rowid IN
+                     (SELECT rowid FROM file_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)''',
+                     (self.max_entries,))
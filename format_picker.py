@@ -0,0 +1,100 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ترتيب تفضيل الامتدادات (الأعلى أفضل)
+EXT_PREFERENCE = {'mp4': 2, 'm4a': 2, 'webm': 1}
+
+# الامتدادات التي تدمج في mp4 دون تحويل إلى mkv أو إعادة ترميز
+MP4_COMPATIBLE = ('mp4', 'm4a')
+
+
+def estimate_size(fmt: dict, duration: float = None) -> int:
+    """تقدير حجم الصيغة من filesize أو filesize_approx أو معدل البت × المدة"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return int(size)
+    bitrate = fmt.get('tbr') or ((fmt.get('vbr') or 0) + (fmt.get('abr') or 0))
+    if bitrate and duration:
+        # معدل البت بالكيلوبت في الثانية
+        return int(bitrate * 1000 / 8 * duration)
+    return None
+
+
+def _has_video(fmt: dict) -> bool:
+    return fmt.get('vcodec') not in (None, 'none')
+
+
+def _has_audio(fmt: dict) -> bool:
+    return fmt.get('acodec') not in (None, 'none')
+
+
+def _quality(main: dict, parts: list) -> tuple:
+    """ترتيب الخيارات: صيغ mp4/m4a أولاً ثم الدقة ثم الامتداد ثم معدل البت"""
+    return (
+        all(f.get('ext') in MP4_COMPATIBLE for f in parts),
+        main.get('height') or 0,
+        min(EXT_PREFERENCE.get(f.get('ext'), 0) for f in parts),
+        main.get('tbr') or 0,
+        sum(f.get('tbr') or 0 for f in parts[1:]),
+    )
+
+
+def _candidates(formats: list, audio_only: bool) -> list:
+    """إرجاع قائمة (الصيغة الرئيسية، أجزاء الصيغة) لكل خيار ممكن"""
+    if audio_only:
+        return [(f, [f]) for f in formats if _has_audio(f) and not _has_video(f)]
+
+    combined = [f for f in formats if _has_video(f) and _has_audio(f)]
+    video_only = [f for f in formats if _has_video(f) and not _has_audio(f)]
+    audio_only_formats = [f for f in formats if _has_audio(f) and not _has_video(f)]
+
+    candidates = [(f, [f]) for f in combined]
+    for video in video_only:
+        for audio in audio_only_formats:
+            candidates.append((video, [video, audio]))
+
+    # بعض المنصات لا تحدد الترميز، نعتبر الصيغة كاملة
+    if not candidates:
+        candidates = [(f, [f]) for f in formats if f.get('vcodec') is None and f.get('acodec') is None]
+    return candidates
+
+
+def select_format(info: dict, max_bytes: int, audio_only: bool = False) -> str:
+    """اختيار أفضل صيغة لا يتجاوز حجمها الحد المسموح قبل تحميل أي بايت
+
+    ترجع معرف الصيغة (مثل "137+140")، أو None إذا كانت الأحجام غير معروفة،
+    وترفع استثناء إذا كانت جميع الصيغ المعروفة أكبر من الحد.
+    """
+    formats = info.get('formats') or []
+    if not formats:
+        # الفيديو يحتوي على صيغة واحدة فقط
+        size = estimate_size(info, info.get('duration'))
+        if size and size > max_bytes:
+            raise Exception("⚠️ حجم الفيديو كبير جداً")
+        return None
+
+    duration = info.get('duration')
+    best = None
+    unknown = False
+
+    for main, parts in _candidates(formats, audio_only):
+        sizes = [estimate_size(f, duration) for f in parts]
+        if None in sizes:
+            unknown = True
+            continue
+        total = sum(sizes)
+        if total > max_bytes:
+            continue
+        quality = _quality(main, parts)
+        if best is None or quality > best[0]:
+            best = (quality, '+'.join(f['format_id'] for f in parts), total)
+
+    if best:
+        logger.info(f"Selected format {best[1]} (~{best[2] / (1024 * 1024):.1f}MB)")
+        return best[1]
+
+    if unknown:
+        return None
+
+    raise Exception("⚠️ حجم الفيديو كبير جداً")
@@ -0,0 +1,122 @@
+import os
+import logging
+import tempfile
+import aiohttp
+from .metrics import DOWNLOADED_BYTES
+
+logger = logging.getLogger(__name__)
+
+# الحد الأقصى للاتصالات المفتوحة (الكلي ولكل مضيف)
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "10"))
+
+# مدة تخزين نتائج DNS (بالثواني)
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+
+# مدة إبقاء الاتصالات الخاملة مفتوحة (بالثواني)
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+
+# المهلات الافتراضية لكل الطلبات
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=120, connect=10, sock_read=30)
+
+# حجم القطعة عند تحميل الملفات
+CHUNK_SIZE = 64 * 1024
+
+# الذاكرة المخصصة لكل ملف متدفق قبل نقله إلى القرص، أقل من حد الرفع حتى لا تبقى الملفات الكبيرة
+# كاملة في الذاكرة مع التحميلات المتزامنة (16MB × 8 تحميلات ≈ 128MB كحد أقصى)
+STREAM_MEMORY_LIMIT = int(os.getenv("STREAM_MEMORY_LIMIT_MB", "16")) * 1024 * 1024
+
+_session = None
+
+
+async def start_session(**session_kwargs) -> aiohttp.ClientSession:
+    """إنشاء جلسة HTTP المشتركة (المعاملات الإضافية تمرر إلى ClientSession)"""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+        )
+        # الكوكيز تمرر لكل طلب على حدة حتى لا تختلط بين المستخدمين
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=DEFAULT_TIMEOUT,
+            cookie_jar=aiohttp.DummyCookieJar(),
+            **session_kwargs
+        )
+        logger.info("Shared HTTP session started")
+    return _session
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """الحصول على جلسة HTTP المشتركة وإنشاؤها عند الحاجة"""
+    if _session is None or _session.closed:
+        return await start_session()
+    return _session
+
+
+async def close_session():
+    """إغلاق جلسة HTTP المشتركة"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def check_content_length(response, max_bytes: int):
+    """رفض الملف مبكراً إذا كان حجمه المعلن أكبر من الحد"""
+    if max_bytes and response.content_length and response.content_length > max_bytes:
+        raise Exception("⚠️ حجم الفيديو كبير جداً")
+
+
+async def _stream_response(url: str, f, max_bytes: int = None, platform: str = None, **kwargs) -> int:
+    """نسخ محتوى الاستجابة إلى ملف مفتوح على دفعات"""
+    session = await get_session()
+    size = 0
+    try:
+        async with session.get(url, **kwargs) as response:
+            if response.status != 200:
+                # خطأ من نوع aiohttp حتى يعتبر فشلاً للوكيل ويعاد الطلب عبر وكيل آخر
+                raise aiohttp.ClientResponseError(
+                    response.request_info, response.history,
+                    status=response.status, message=f"❌ فشل تحميل الفيديو: {response.status}"
+                )
+            check_content_length(response, max_bytes)
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                size += len(chunk)
+                # إيقاف التحميل فور تجاوز الحد إذا لم يكن الحجم معلناً
+                if max_bytes and size > max_bytes:
+                    raise Exception("⚠️ حجم الفيديو كبير جداً")
+                f.write(chunk)
+    finally:
+        # البايتات المنقولة تحتسب حتى لو فشل التحميل في منتصفه
+        DOWNLOADED_BYTES.inc(size, platform=platform or 'unknown')
+    return size
+
+
+async def download_to_file(url: str, path: str, max_bytes: int = None, platform: str = None, **kwargs) -> int:
+    """تحميل ملف بشكل متدفق إلى القرص وإرجاع عدد البايتات"""
+    try:
+        with open(path, 'wb') as f:
+            return await _stream_response(url, f, max_bytes, platform, **kwargs)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+async def download_to_buffer(url: str, max_bytes: int = None, spool_dir: str = None, platform: str = None, **kwargs):
+    """تحميل ملف إلى مخزن مؤقت في الذاكرة لا ينتقل إلى القرص إلا إذا تجاوز STREAM_MEMORY_LIMIT
+
+    ترجع المخزن جاهزاً للقراءة من البداية
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=STREAM_MEMORY_LIMIT, dir=spool_dir)
+    try:
+        await _stream_response(url, buffer, max_bytes, platform, **kwargs)
+    except Exception:
+        buffer.close()
+        raise
+    buffer.seek(0)
+    return buffer
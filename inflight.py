@@ -0,0 +1,40 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class InFlightRequests:
+    """دمج الطلبات المتزامنة لنفس الفيديو في عملية تحميل واحدة"""
+
+    def __init__(self):
+        self._tasks = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def __contains__(self, key) -> bool:
+        return key in self._tasks
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def run(self, key, func, *args, **kwargs) -> tuple:
+        """تشغيل المهمة أو انتظار المهمة الجارية لنفس المفتاح
+
+        ترجع (النتيجة، joined) حيث joined تعني أن الطلب انضم لمهمة بدأها طلب آخر
+        """
+        task = self._tasks.get(key)
+        joined = task is not None
+
+        if joined:
+            self.coalesced += 1
+            logger.info(f"Joining in-flight download for {key}")
+        else:
+            self.started += 1
+            task = asyncio.ensure_future(func(*args, **kwargs))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+
+        # الحماية من الإلغاء حتى لا يلغي خروج أحد المنتظرين التحميل للبقية
+        result = await asyncio.shield(task)
+        return result, joined
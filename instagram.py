@@ -3,9 +3,11 @@ import logging
 from datetime import datetime
 import yt_dlp
 import sys
-import re
 import shutil
 import locale
+from . import ytdlp_runner
+from .limits import get_max_file_size
+from .registry import registry
 
 # تعيين ترميز النظام
 if sys.platform.startswith('win'):
@@ -33,22 +35,20 @@ def get_ffmpeg_path():
 
 def is_valid_instagram_url(url: str) -> bool:
     """التحقق من صحة رابط إنستغرام"""
-    patterns = [
-        r'https?://(?:www\.)?instagram\.com/(?:p|reel|tv)/[\w-]+/?',
-        r'https?://(?:www\.)?instagram\.com/stories/[\w\.]+/\d+/?'
-    ]
-    return any(re.match(pattern, url) for pattern in patterns)
+    return registry.is_supported('instagram', url)
 
 async def download_instagram(url: str, download_dir: str) -> tuple:
     """تحميل الفيديو من إنستغرام باستخدام yt-dlp"""
     try:
         # التحقق من وجود ffmpeg
         if not check_ffmpeg():
-            print("⚠️ يرجى تثبيت ffmpeg على نظامك أولاً")
-            print("1. قم بتحميل ffmpeg من: https://ffmpeg.org/download.html")
-            print("2. قم بفك ضغط الملف")
-            print("3. انسخ المجلد إلى C:\\Program Files\\ffmpeg")
-            print("4. أضف مسار C:\\Program Files\\ffmpeg\\bin إلى متغير البيئة PATH")
+            logger.error(
+                "⚠️ يرجى تثبيت ffmpeg على نظامك أولاً\n"
+                "1. قم بتحميل ffmpeg من: https://ffmpeg.org/download.html\n"
+                "2. قم بفك ضغط الملف\n"
+                "3. انسخ المجلد إلى C:\\Program Files\\ffmpeg\n"
+                "4. أضف مسار C:\\Program Files\\ffmpeg\\bin إلى متغير البيئة PATH"
+            )
             raise Exception("يرجى تثبيت ffmpeg")
             
         # التحقق من صحة الرابط
@@ -58,7 +58,7 @@ async def download_instagram(url: str, download_dir: str) -> tuple:
         # إنشاء مجلد التحميلات إذا لم يكن موجوداً
         os.makedirs(download_dir, exist_ok=True)
             
-        print(f"بدء تحميل فيديو إنستغرام: {url}")
+        logger.info(f"بدء تحميل فيديو إنستغرام: {url}")
         
         # تنظيف الرابط
         url = url.split('?')[0].rstrip('/')
@@ -95,18 +95,11 @@ async def download_instagram(url: str, download_dir: str) -> tuple:
         # إضافة ملف الكوكيز إذا كان موجوداً
         cookies_file = os.path.join(os.path.dirname(__file__), 'cookies.txt')
         if os.path.exists(cookies_file):
-            print("تم العثور على ملف الكوكيز")
+            logger.info("تم العثور على ملف الكوكيز")
             ydl_opts['cookiefile'] = cookies_file
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            try:
-                # استخراج معلومات الفيديو
-                print("جاري استخراج معلومات الفيديو...")
-                info = ydl.extract_info(url, download=False)
-                
-                if not info:
-                    raise Exception("لم يتم العثور على الفيديو")
-                    
+        try:
+            def first_video(info: dict) -> dict:
                 # التحقق من نوع المحتوى
                 if info.get('_type') == 'playlist':
                     if not info.get('entries'):
@@ -116,65 +109,59 @@ async def download_instagram(url: str, download_dir: str) -> tuple:
                 # التحقق من أن المحتوى فيديو
                 if not info.get('is_video', True):
                     raise Exception("هذا المنشور ليس فيديو")
-                
-                # التحقق من حجم الفيديو
-                filesize = info.get('filesize', 0)
-                if filesize and filesize > 50 * 1024 * 1024:  # 50MB
-                    print("الفيديو كبير جداً، جاري محاولة تحميله بجودة أقل...")
-                    ydl_opts['format'] = 'worst[ext=mp4]/worst'
-                    info = ydl.extract_info(url, download=False)
-                
-                # تحميل الفيديو
-                print("جاري تحميل الفيديو...")
-                ydl.download([url])
-                
-                # الحصول على اسم الملف
-                filename = ydl.prepare_filename(info)
-                if not filename.endswith('.mp4'):
-                    new_filename = filename.rsplit('.', 1)[0] + '.mp4'
-                    if os.path.exists(filename):
-                        os.rename(filename, new_filename)
-                    filename = new_filename
-                
-                if not os.path.exists(filename):
-                    raise Exception("فشل تحميل الفيديو")
-                
-                # التحقق من حجم الملف النهائي
-                if os.path.getsize(filename) > 50 * 1024 * 1024:  # 50MB
-                    os.remove(filename)
-                    raise Exception("حجم الفيديو كبير جداً")
-                
-                # استخراج العنوان
-                title = info.get('title', '')
+                return info
+            
+            # تحميل الفيديو بأفضل صيغة ضمن الحد المسموح
+            logger.info("جاري تحميل الفيديو...")
+            max_size = get_max_file_size()
+            filename, info = await ytdlp_runner.download_within_limit(ydl_opts, url, 'instagram', prepare=first_video)
+            
+            # الحصول على اسم الملف
+            if not filename.endswith('.mp4'):
+                new_filename = filename.rsplit('.', 1)[0] + '.mp4'
+                if os.path.exists(filename):
+                    os.rename(filename, new_filename)
+                filename = new_filename
+            
+            if not os.path.exists(filename):
+                raise Exception("فشل تحميل الفيديو")
+            
+            # التحقق من حجم الملف النهائي
+            if os.path.getsize(filename) > max_size:
+                os.remove(filename)
+                raise Exception("حجم الفيديو كبير جداً")
+            
+            # استخراج العنوان
+            title = info.get('title', '')
+            if not title:
+                title = info.get('description', '')
                 if not title:
-                    title = info.get('description', '')
-                    if not title:
-                        title = os.path.splitext(os.path.basename(filename))[0]
-                    elif len(title) > 100:  # تقصير الوصف إذا كان طويلاً
-                        title = title[:97] + '...'
-                
-                print(f"تم تحميل الفيديو بنجاح: {filename}")
-                return filename, title
-                
-            except yt_dlp.utils.DownloadError as e:
-                error_msg = str(e).lower()
-                print(f"خطأ في تحميل الفيديو: {error_msg}")
+                    title = os.path.splitext(os.path.basename(filename))[0]
+                elif len(title) > 100:  # تقصير الوصف إذا كان طويلاً
+                    title = title[:97] + '...'
+            
+            logger.info(f"تم تحميل الفيديو بنجاح: {filename}")
+            return filename, title
+            
+        except yt_dlp.utils.DownloadError as e:
+            error_msg = str(e).lower()
+            logger.error(f"خطأ في تحميل الفيديو: {error_msg}")
+            
+            if 'private' in error_msg:
+                raise Exception("هذا المحتوى خاص")
+            elif 'login' in error_msg:
+                raise Exception("يجب تسجيل الدخول لمشاهدة هذا المحتوى")
+            elif 'not found' in error_msg or '404' in error_msg:
+                raise Exception("المنشور غير موجود")
+            elif 'video' in error_msg:
+                raise Exception("هذا المنشور ليس فيديو")
+            elif 'ffmpeg' in error_msg:
+                raise Exception("يرجى تثبيت ffmpeg على نظامك")
+            else:
+                raise Exception(f"خطأ في التحميل: {str(e)}")
                 
-                if 'private' in error_msg:
-                    raise Exception("هذا المحتوى خاص")
-                elif 'login' in error_msg:
-                    raise Exception("يجب تسجيل الدخول لمشاهدة هذا المحتوى")
-                elif 'not found' in error_msg or '404' in error_msg:
-                    raise Exception("المنشور غير موجود")
-                elif 'video' in error_msg:
-                    raise Exception("هذا المنشور ليس فيديو")
-                elif 'ffmpeg' in error_msg:
-                    raise Exception("يرجى تثبيت ffmpeg على نظامك")
-                else:
-                    raise Exception(f"خطأ في التحميل: {str(e)}")
-                    
     except Exception as e:
-        print(f"خطأ في تحميل فيديو إنستغرام: {str(e)}")
+        logger.error(f"خطأ في تحميل فيديو إنستغرام: {str(e)}")
         # تنظيف الملفات المؤقتة في حالة الفشل
         try:
             temp_file = os.path.join(download_dir, f"instagram_{datetime.now().strftime('%Y%m%d')}")
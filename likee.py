@@ -1,13 +1,20 @@
 import os
 import logging
 import asyncio
-import yt_dlp
 import re
-import requests
+import aiohttp
 from urllib.parse import urlparse, urljoin, unquote
+from . import http_client
+from . import canonical
+from .limits import get_max_file_size
+from .registry import registry
+from .tracing import stage
 
 logger = logging.getLogger(__name__)
 
+# مهلة فحص الروابط المباشرة
+HEAD_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
 class LikeeDownloader:
     def __init__(self, download_dir: str):
         self.download_dir = download_dir
@@ -41,22 +48,8 @@ class LikeeDownloader:
         url = LikeeDownloader.normalize_url(url)
         logger.info(f"Checking URL validity: {url}")
         
-        patterns = [
-            r'https?://(?:www\.)?likee\.video/(?:v|video)/[\w\.-]+',
-            r'https?://(?:www\.)?l\.likee\.video/v/[\w\.-]+',
-            r'https?://(?:www\.)?like\.video/(?:v|video)/[\w\.-]+',
-            r'https?://(?:www\.)?likee\.video/v/[\w\.-]+',
-            r'https?://l\.likee\.video/[\w\.-]+',
-            r'https?://l\.likeevideo/v/[\w\.-]+',
-            r'https?://(?:www\.)?likeevideo/v/[\w\.-]+',
-            r'https?://(?:www\.)?likee\.video/[\w\.-]+',
-            r'https?://(?:www\.)?like\.video/[\w\.-]+'
-        ]
-        
-        for pattern in patterns:
-            if re.match(pattern, url, re.IGNORECASE):
-                logger.info(f"URL matches pattern: {pattern}")
-                return True
+        if registry.is_supported('likee', url):
+            return True
                 
         logger.warning(f"URL does not match any pattern: {url}")
         return False
@@ -65,25 +58,8 @@ class LikeeDownloader:
     def extract_video_id(url: str) -> str:
         """استخراج معرف الفيديو من الرابط"""
         try:
-            # تنظيف الرابط
-            url = url.strip()
-            if not url.startswith(('http://', 'https://')):
-                url = 'https://' + url
-            
-            # أنماط مختلفة من روابط لايكي
-            patterns = [
-                r'likee\.video/(?:v/)?(\w+)',  # likee.video/v/abc123 or likee.video/abc123
-                r'l\.likee\.video/(?:v/)?(\w+)',  # l.likee.video/v/abc123
-                r'like\.video/(?:v/)?(\w+)',  # like.video/v/abc123
-                r'likeevideo/(?:v/)?(\w+)'  # likeevideo/v/abc123
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, url)
-                if match:
-                    return match.group(1)
-            
-            return None
+            # نفس الأنماط المستخدمة لمفاتيح الذاكرات المؤقتة ودمج الطلبات
+            return canonical.extract_video_id(url.strip(), 'likee')
             
         except Exception as e:
             logger.error(f"Error extracting video ID: {str(e)}")
@@ -111,13 +87,14 @@ class LikeeDownloader:
                 ]
                 
                 # تجربة كل رابط مباشر
+                session = await http_client.get_session()
                 for direct_url in direct_urls:
                     try:
                         logger.info(f"Trying direct URL: {direct_url}")
-                        response = requests.head(direct_url, headers=self.headers, allow_redirects=True, timeout=10)
-                        if response.status_code == 200:
-                            logger.info(f"Found working direct URL: {direct_url}")
-                            return direct_url
+                        async with session.head(direct_url, headers=self.headers, allow_redirects=True, timeout=HEAD_TIMEOUT) as response:
+                            if response.status == 200:
+                                logger.info(f"Found working direct URL: {direct_url}")
+                                return direct_url
                     except Exception as e:
                         logger.warning(f"Failed to access direct URL {direct_url}: {str(e)}")
                         continue
@@ -128,51 +105,53 @@ class LikeeDownloader:
             logger.error(f"Error getting final URL: {str(e)}")
             return url
 
+    async def get_video_url(self, url: str) -> tuple:
+        """الحصول على (رابط الفيديو المباشر، العنوان، معرف الفيديو)"""
+        # التحقق من صحة الرابط
+        if not self.is_valid_likee_url(url):
+            error_msg = "❌ عذراً، هذا الرابط غير مدعوم"
+            logger.error(error_msg)
+            raise Exception(error_msg)
+        
+        # استخراج معرف الفيديو
+        video_id = self.extract_video_id(url)
+        if not video_id:
+            raise Exception("❌ لم نتمكن من استخراج معرف الفيديو")
+        
+        # الحصول على رابط الفيديو المباشر
+        api_url = f"https://likee.video/api/video/info?video_id={video_id}"
+        session = await http_client.get_session()
+        async with session.get(api_url, headers=self.headers) as response:
+            if response.status != 200:
+                raise Exception(f"❌ فشل الاتصال بخادم لايكي: {response.status}")
+            
+            data = await response.json(content_type=None)
+        if 'data' not in data or 'video_url' not in data['data']:
+            raise Exception("❌ لم نتمكن من العثور على رابط الفيديو")
+        
+        video_url = data['data']['video_url']
+        video_title = data['data'].get('title', f'likee_video_{video_id}')
+        return video_url, video_title, video_id
+
     async def download(self, url: str) -> tuple:
         """تحميل الفيديو من لايكي"""
         try:
             logger.info(f"Starting Likee video download for URL: {url}")
             
-            # التحقق من صحة الرابط
-            if not self.is_valid_likee_url(url):
-                error_msg = "❌ عذراً، هذا الرابط غير مدعوم"
-                logger.error(error_msg)
-                raise Exception(error_msg)
-            
             # إنشاء مجلد التحميلات إذا لم يكن موجوداً
             if not os.path.exists(self.download_dir):
                 os.makedirs(self.download_dir)
                 logger.info(f"Created download directory: {self.download_dir}")
             
-            # استخراج معرف الفيديو
-            video_id = self.extract_video_id(url)
-            if not video_id:
-                raise Exception("❌ لم نتمكن من استخراج معرف الفيديو")
-            
-            # الحصول على رابط الفيديو المباشر
-            api_url = f"https://likee.video/api/video/info?video_id={video_id}"
-            response = requests.get(api_url, headers=self.headers)
-            if response.status_code != 200:
-                raise Exception(f"❌ فشل الاتصال بخادم لايكي: {response.status_code}")
-            
-            data = response.json()
-            if 'data' not in data or 'video_url' not in data['data']:
-                raise Exception("❌ لم نتمكن من العثور على رابط الفيديو")
-            
-            video_url = data['data']['video_url']
-            video_title = data['data'].get('title', f'likee_video_{video_id}')
-            video_path = os.path.join(self.download_dir, f"{video_title}.mp4")
+            with stage('likee', 'extract'):
+                video_url, video_title, video_id = await self.get_video_url(url)
+            video_path = os.path.join(self.download_dir, f"likee_{video_id}.mp4")
             
             # تحميل الفيديو
             logger.info(f"Downloading video from: {video_url}")
-            video_response = requests.get(video_url, headers=self.headers, stream=True)
-            if video_response.status_code != 200:
-                raise Exception(f"❌ فشل تحميل الفيديو: {video_response.status_code}")
-            
-            with open(video_path, 'wb') as f:
-                for chunk in video_response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+            with stage('likee', 'download'):
+                await http_client.download_to_file(video_url, video_path, max_bytes=get_max_file_size(),
+                                                   platform='likee', headers=self.headers)
             
             if not os.path.exists(video_path):
                 raise Exception("❌ فشل تحميل الفيديو")
@@ -185,7 +164,36 @@ class LikeeDownloader:
             logger.error(f"Error in LikeeDownloader: {error_msg}")
             raise Exception(error_msg)
 
+    async def stream(self, url: str) -> tuple:
+        """تحميل الفيديو إلى مخزن مؤقت للرفع مباشرة دون المرور بمجلد التحميلات"""
+        try:
+            logger.info(f"Starting Likee video stream for URL: {url}")
+            with stage('likee', 'extract'):
+                video_url, video_title, video_id = await self.get_video_url(url)
+            
+            with stage('likee', 'download'):
+                buffer = await http_client.download_to_buffer(
+                    video_url,
+                    max_bytes=get_max_file_size(),
+                    spool_dir=self.download_dir,
+                    platform='likee',
+                    headers=self.headers
+                )
+            
+            logger.info(f"Successfully streamed video: {video_title}")
+            return buffer, video_title
+            
+        except Exception as e:
+            error_msg = str(e) if str(e) != "" else "❌ حدث خطأ أثناء تحميل الفيديو"
+            logger.error(f"Error in LikeeDownloader: {error_msg}")
+            raise Exception(error_msg)
+
 async def download_likee(url: str, download_dir: str) -> tuple[str, str]:
     """تحميل فيديو من لايكي"""
     downloader = LikeeDownloader(download_dir=download_dir)
     return await downloader.download(url)
+
+async def stream_likee(url: str, download_dir: str = None) -> tuple:
+    """تحميل فيديو من لايكي إلى مخزن مؤقت للرفع مباشرة"""
+    downloader = LikeeDownloader(download_dir=download_dir)
+    return await downloader.stream(url)
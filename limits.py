@@ -0,0 +1,31 @@
+import os
+
+# الحد الافتراضي لحجم الملفات التي يمكن رفعها عبر Bot API العام
+DEFAULT_MAX_FILE_SIZE = 50 * 1024 * 1024
+
+# الحد عند استخدام خادم telegram-bot-api محلي
+LOCAL_MAX_FILE_SIZE = 2000 * 1024 * 1024
+
+# رابط خادم Bot API المحلي (مثل http://localhost:8081)، فارغ لاستخدام الخادم العام
+LOCAL_BOT_API_URL = os.getenv("LOCAL_BOT_API_URL", "").rstrip('/')
+
+# يمكن تخفيض الحد عبر متغير البيئة MAX_FILE_SIZE_MB
+MAX_FILE_SIZE = int(float(os.getenv("MAX_FILE_SIZE_MB", "0")) * 1024 * 1024)
+
+
+def is_local_mode() -> bool:
+    """هل يعمل البوت عبر خادم Bot API محلي"""
+    return bool(LOCAL_BOT_API_URL)
+
+
+def get_max_file_size() -> int:
+    """الحد الأقصى لحجم الملف بالبايت حسب وضع التشغيل"""
+    limit = LOCAL_MAX_FILE_SIZE if is_local_mode() else DEFAULT_MAX_FILE_SIZE
+    if MAX_FILE_SIZE:
+        return min(MAX_FILE_SIZE, limit)
+    return limit
+
+
+def format_size(size: int) -> str:
+    """عرض الحجم بالميجابايت"""
+    return f"{size / (1024 * 1024):.0f}MB"
@@ -0,0 +1,189 @@
+import os
+import copy
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+from collections import OrderedDict
+from .canonical import get_video_id, has_video_id
+from .database import Database
+
+logger = logging.getLogger(__name__)
+
+# مدة صلاحية المعلومات لكل منصة (بالثواني) - روابط الصيغ الموقعة تنتهي صلاحيتها
+PLATFORM_TTLS = {
+    'youtube': 3600,
+    'instagram': 1800,
+    'facebook': 1800,
+    'twitter': 3600,
+    'tiktok': 300,
+    'likee': 600,
+}
+DEFAULT_TTL = 600
+
+# مفاتيح كبيرة الحجم لا تحتاجها عملية التحميل ولا فحص الحجم
+DROP_KEYS = (
+    'thumbnails', 'subtitles', 'automatic_captions', 'requested_subtitles',
+    'comments', 'heatmap', 'chapters', 'tags', 'categories',
+)
+
+# الحد الأقصى لطول الوصف المحفوظ (يستخدم كعنوان بديل)
+MAX_DESCRIPTION_LENGTH = 300
+
+# خيارات yt-dlp التي تغير نتيجة الاستخراج وتدخل في مفتاح الذاكرة المؤقتة
+KEY_OPTIONS = ('force_generic_extractor', 'extractor_args', 'noplaylist', 'cookiefile', 'proxy')
+
+
+def trim_info(info: dict) -> dict:
+    """تقليص معلومات الفيديو مع الإبقاء على العنوان والمعرف والصيغ والحجم"""
+    trimmed = {k: v for k, v in info.items() if k not in DROP_KEYS}
+
+    description = trimmed.get('description')
+    if description and len(description) > MAX_DESCRIPTION_LENGTH:
+        trimmed['description'] = description[:MAX_DESCRIPTION_LENGTH]
+
+    if trimmed.get('formats'):
+        trimmed['formats'] = [
+            f for f in trimmed['formats']
+            if f.get('ext') != 'mhtml' and f.get('format_note') != 'storyboard'
+        ]
+
+    if trimmed.get('entries'):
+        trimmed['entries'] = [trim_info(entry) for entry in trimmed['entries'] if entry]
+
+    return trimmed
+
+
+class MetadataCache:
+    """ذاكرة مؤقتة لنتائج extract_info مع LRU في الذاكرة وطبقة SQLite اختيارية على خيط قاعدة بيانات مستقل"""
+
+    def __init__(self, max_entries: int = 1024, db_path: str = None, ttls: dict = None):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.db = Database(db_path) if db_path else None
+        self.ttls = dict(PLATFORM_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self._entries = OrderedDict()
+        self._table_ready = False
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _create_metadata_table(conn: sqlite3.Connection):
+        """إنشاء جدول الطبقة الدائمة"""
+        conn.execute('''CREATE TABLE IF NOT EXISTS metadata_cache
+                    (cache_key TEXT PRIMARY KEY,
+                     info TEXT NOT NULL,
+                     expires_at REAL)''')
+
+    @staticmethod
+    def _load_metadata(conn: sqlite3.Connection, key: str, now: float) -> tuple:
+        row = conn.execute('SELECT info, expires_at FROM metadata_cache WHERE cache_key = ? AND expires_at > ?',
+                           (key, now)).fetchone()
+        if not row:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    @staticmethod
+    def _save_metadata(conn: sqlite3.Connection, key: str, info: dict, expires_at: float, now: float):
+        conn.execute('INSERT OR REPLACE INTO metadata_cache VALUES (?, ?, ?)', (key, json.dumps(info), expires_at))
+        conn.execute('DELETE FROM metadata_cache WHERE expires_at < ?', (now,))
+
+    @staticmethod
+    def _delete_metadata(conn: sqlite3.Connection, key: str):
+        conn.execute('DELETE FROM metadata_cache WHERE cache_key = ?', (key,))
+
+    async def _ensure_table(self):
+        if not self._table_ready:
+            await self.db.transaction(self._create_metadata_table)
+            self._table_ready = True
+
+    @staticmethod
+    def make_key(url: str, platform: str, ydl_opts: dict = None) -> str:
+        """إنشاء مفتاح موحد من المنصة ومعرف الفيديو وخيارات الاستخراج المؤثرة"""
+        key = f"{platform}:{get_video_id(url, platform)}"
+        options = {name: ydl_opts[name] for name in KEY_OPTIONS if ydl_opts and name in ydl_opts}
+        if options:
+            digest = hashlib.sha1(json.dumps(options, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+            key = f"{key}:{digest[:12]}"
+        return key
+
+    async def get(self, url: str, platform: str, ydl_opts: dict = None):
+        """إرجاع المعلومات المخزنة إذا كانت صالحة"""
+        # الروابط دون معرف فيديو (صفحات الدخول وغيرها) لا تخزن حتى لا تتشارك مفتاحاً واحداً
+        if not has_video_id(url, platform):
+            return None
+        key = self.make_key(url, platform, ydl_opts)
+        now = time.time()
+
+        # نسخة عميقة لأن yt-dlp يعدل الصيغ في المعلومات أثناء التحميل
+        entry = self._entries.get(key)
+        if entry and entry[0] > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(copy.deepcopy(entry[1]), _from_cache=True)
+
+        if entry:
+            del self._entries[key]
+
+        if self.db:
+            try:
+                await self._ensure_table()
+                info, expires_at = await self.db.call(self._load_metadata, key, now)
+            except Exception as e:
+                logger.warning(f"Failed to load metadata for {key}: {str(e)}")
+                info = None
+            if info:
+                self._remember(key, info, expires_at)
+                self.hits += 1
+                return dict(copy.deepcopy(info), _from_cache=True)
+
+        self.misses += 1
+        return None
+
+    async def set(self, url: str, platform: str, info: dict, ydl_opts: dict = None) -> dict:
+        """تخزين المعلومات المقلصة وإرجاعها"""
+        trimmed = trim_info(info)
+        if not has_video_id(url, platform):
+            return trimmed
+        key = self.make_key(url, platform, ydl_opts)
+        now = time.time()
+        expires_at = now + self.ttls.get(platform, DEFAULT_TTL)
+        self._remember(key, copy.deepcopy(trimmed), expires_at)
+
+        if self.db:
+            try:
+                await self._ensure_table()
+                await self.db.transaction(self._save_metadata, key, trimmed, expires_at, now)
+            except Exception as e:
+                logger.warning(f"Failed to persist metadata for {key}: {str(e)}")
+
+        return trimmed
+
+    async def invalidate(self, url: str, platform: str, ydl_opts: dict = None):
+        """حذف المعلومات المخزنة لرابط معين"""
+        key = self.make_key(url, platform, ydl_opts)
+        self._entries.pop(key, None)
+        if self.db:
+            await self._ensure_table()
+            await self.db.transaction(self._delete_metadata, key)
+
+    async def close(self):
+        """إغلاق اتصال الطبقة الدائمة"""
+        if self.db:
+            await self.db.close()
+
+    def _remember(self, key: str, info: dict, expires_at: float):
+        self._entries[key] = (expires_at, info)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+# الذاكرة المؤقتة المشتركة بين جميع أدوات التحميل
+metadata_cache = MetadataCache(
+    max_entries=int(os.getenv("METADATA_CACHE_SIZE", "1024")),
+    db_path=os.getenv("METADATA_CACHE_DB") or None
+)
@@ -0,0 +1,267 @@
+import os
+import time
+import logging
+import contextlib
+
+logger = logging.getLogger(__name__)
+
+# عنوان نقطة /metrics، المنفذ 0 يعطلها
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# حدود فئات مدد المراحل (بالثواني)
+STAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# حدود فئات مدد الكتابة في قاعدة البيانات (بالثواني)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+class Metric:
+    """مقياس بقيم منفصلة لكل مجموعة من التسميات
+
+    يمكن ربطه بدالة تقرأ القيم من عدادات موجودة عند كل قراءة بدلاً من تحديثه يدوياً.
+    """
+
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._function = None
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def set_function(self, func):
+        """قراءة القيم من func() عند كل عرض: رقم، أو قاموس {قيمة التسمية: رقم} لمقياس بتسمية واحدة"""
+        self._function = func
+
+    def _samples(self) -> list:
+        if self._function is None:
+            return [(self.name, key, value) for key, value in self._values.items()]
+        value = self._function()
+        if isinstance(value, dict):
+            return [(self.name, (str(label),), v) for label, v in value.items()]
+        return [(self.name, (), value)]
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, key, value in self._samples():
+            lines.append(f"{name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """عداد متزايد فقط"""
+
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """قيمة حالية قابلة للزيادة والنقصان"""
+
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """توزيع القيم على فئات تراكمية مع المجموع والعدد"""
+
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = STAGE_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        counts = entry[0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """قياس مدة الكتلة وتسجيلها حتى عند حدوث خطأ"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> list:
+        samples = []
+        bucket_labels = self.label_names + ('le',)
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", key + (_format_value(float(bound)),), cumulative, bucket_labels))
+            samples.append((f"{self.name}_sum", key, total, self.label_names))
+            samples.append((f"{self.name}_count", key, count, self.label_names))
+        return samples
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for name, key, value, label_names in self._samples():
+            lines.append(f"{name}{_format_labels(label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    """جميع المقاييس المعروضة في /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.warning(f"Error collecting metric {metric.name}: {str(e)}")
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# الطلبات
+REQUESTS = REGISTRY.register(Counter(
+    'bot_requests_total', 'Links received by handle_url.', ('platform',)))
+REQUESTS_SUCCEEDED = REGISTRY.register(Counter(
+    'bot_requests_succeeded_total', 'Links answered with a video, by source (download, joined, cache).', ('platform', 'source')))
+REQUESTS_FAILED = REGISTRY.register(Counter(
+    'bot_requests_failed_total', 'Links that ended with an error, by exception class.', ('platform', 'error')))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'bot_request_duration_seconds', 'Total time spent in handle_url.', ('platform',)))
+
+# مراحل التحميل: resolve, extract, download, upload
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'bot_stage_duration_seconds', 'Time spent in each stage of a download job.', ('platform', 'stage')))
+
+# حجم البيانات
+DOWNLOADED_BYTES = REGISTRY.register(Counter(
+    'bot_downloaded_bytes_total', 'Media bytes downloaded from platforms.', ('platform',)))
+UPLOADED_BYTES = REGISTRY.register(Counter(
+    'bot_uploaded_bytes_total', 'Media bytes uploaded to Telegram.', ('platform',)))
+
+# المجدول والطلبات الجارية (تقرأ من المكونات عند العرض)
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'bot_download_queue_depth', 'Download jobs waiting in the scheduler queue.', ('platform',)))
+RUNNING_JOBS = REGISTRY.register(Gauge(
+    'bot_download_jobs_running', 'Download jobs currently running.', ('platform',)))
+INFLIGHT_JOBS = REGISTRY.register(Gauge(
+    'bot_inflight_jobs', 'Download jobs in flight; concurrent requests for the same video share one job.'))
+
+# الذاكرات المؤقتة
+CACHE_HITS = REGISTRY.register(Counter(
+    'bot_cache_hits_total', 'Cache hits.', ('cache',)))
+CACHE_MISSES = REGISTRY.register(Counter(
+    'bot_cache_misses_total', 'Cache misses.', ('cache',)))
+CACHE_HIT_RATIO = REGISTRY.register(Gauge(
+    'bot_cache_hit_ratio', 'Cache hits divided by lookups since startup.', ('cache',)))
+
+# قاعدة البيانات
+DB_WRITE_SECONDS = REGISTRY.register(Histogram(
+    'bot_db_write_duration_seconds', 'SQLite write transaction latency including queueing on the database thread.',
+    ('operation',), buckets=DB_BUCKETS))
+
+
+def track_caches(caches: dict):
+    """ربط مقاييس الذاكرات المؤقتة بكائنات لها العدادان hits و misses"""
+    CACHE_HITS.set_function(lambda: {name: cache.hits for name, cache in caches.items()})
+    CACHE_MISSES.set_function(lambda: {name: cache.misses for name, cache in caches.items()})
+    CACHE_HIT_RATIO.set_function(lambda: {
+        name: cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else 0.0
+        for name, cache in caches.items()
+    })
+
+
+class MetricsServer:
+    """خادم HTTP محلي يعرض المقاييس بصيغة Prometheus على /metrics"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def _handle(self, request):
+        from aiohttp import web
+        return web.Response(
+            body=self.registry.render().encode('utf-8'),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+
+    async def start(self):
+        """بدء الخادم إذا كان المنفذ محدداً"""
+        if not self.port or self._runner is not None:
+            return
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except OSError as e:
+            logger.warning(f"Metrics endpoint disabled, cannot listen on {self.host}:{self.port}: {str(e)}")
+            await runner.cleanup()
+            return
+        self._runner = runner
+        logger.info(f"Metrics available at http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+# خادم المقاييس المشترك
+metrics_server = MetricsServer()
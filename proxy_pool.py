@@ -0,0 +1,179 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import aiohttp
+from . import http_client
+
+logger = logging.getLogger(__name__)
+
+# قائمة وكلاء مجانية اختيارية تستخدم فقط عند PROXY_LIST=default
+DEFAULT_PROXIES = [
+    'http://51.159.115.233:3128',
+    'http://13.95.173.197:80',
+    'http://167.172.96.117:34913',
+    'http://51.75.206.209:80',
+]
+
+# الرابط المستخدم لفحص الوكلاء
+PROBE_URL = os.getenv("PROXY_PROBE_URL", "https://www.tiktok.com/robots.txt")
+PROBE_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+# معامل تنعيم متوسط زمن الاستجابة
+LATENCY_SMOOTHING = 0.3
+
+
+class ProxyStats:
+    """إحصائيات وكيل واحد"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency = None
+        self.disabled_until = 0.0
+        self.last_checked = None
+
+    @property
+    def success_rate(self) -> float:
+        # تنعيم لابلاس حتى لا يحصل الوكيل الجديد على صفر
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.disabled_until
+
+    def score(self) -> float:
+        """وزن الاختيار: نسبة النجاح مقسومة على زمن الاستجابة"""
+        latency = self.latency if self.latency is not None else 1.0
+        return self.success_rate / max(latency, 0.05)
+
+    def to_dict(self) -> dict:
+        return {
+            'url': self.url,
+            'successes': self.successes,
+            'failures': self.failures,
+            'success_rate': round(self.success_rate, 3),
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+            'available': self.is_available(time.time()),
+            'score': round(self.score(), 3),
+        }
+
+
+class ProxyPool:
+    """مجمع وكلاء مع فحص دوري وتقييم حسب السرعة ونسبة النجاح"""
+
+    def __init__(self, proxies: list, probe_interval: float = 300, cooldown: float = 300, max_failures: int = 3):
+        self.proxies = {url: ProxyStats(url) for url in proxies}
+        self.probe_interval = probe_interval
+        self.cooldown = cooldown
+        self.max_failures = max_failures
+        self._task = None
+
+    @classmethod
+    def from_env(cls) -> 'ProxyPool':
+        """تحميل قائمة الوكلاء من متغير PROXY_LIST أو من ملف PROXY_FILE، والمجمع فارغ (اتصال مباشر) إذا لم يحدد أي منهما"""
+        proxies = []
+        proxy_file = os.getenv("PROXY_FILE")
+        proxy_list = os.getenv("PROXY_LIST", "").strip()
+        if proxy_file and os.path.exists(proxy_file):
+            with open(proxy_file, encoding='utf-8') as f:
+                proxies = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+        elif proxy_list == 'default':
+            proxies = list(DEFAULT_PROXIES)
+        elif proxy_list:
+            proxies = [p.strip() for p in proxy_list.split(',') if p.strip()]
+
+        return cls(
+            proxies,
+            probe_interval=float(os.getenv("PROXY_PROBE_INTERVAL", "300")),
+            cooldown=float(os.getenv("PROXY_COOLDOWN", "300")),
+            max_failures=int(os.getenv("PROXY_MAX_FAILURES", "3"))
+        )
+
+    def choose(self, exclude: tuple = ()) -> str:
+        """اختيار وكيل بوزن يميل للوكلاء السريعين والسليمين، أو None للاتصال المباشر"""
+        now = time.time()
+        available = [p for p in self.proxies.values() if p.is_available(now) and p.url not in exclude]
+        if not available:
+            return None
+        weights = [p.score() for p in available]
+        return random.choices(available, weights=weights)[0].url
+
+    def report_success(self, proxy: str, latency: float = None):
+        """تسجيل نجاح طلب عبر الوكيل"""
+        stats = self.proxies.get(proxy)
+        if not stats:
+            return
+        stats.successes += 1
+        stats.consecutive_failures = 0
+        if latency is not None:
+            if stats.latency is None:
+                stats.latency = latency
+            else:
+                stats.latency = LATENCY_SMOOTHING * latency + (1 - LATENCY_SMOOTHING) * stats.latency
+
+    def report_failure(self, proxy: str):
+        """تسجيل فشل طلب وإيقاف الوكيل مؤقتاً بعد عدة أخطاء متتالية"""
+        stats = self.proxies.get(proxy)
+        if not stats:
+            return
+        stats.failures += 1
+        stats.consecutive_failures += 1
+        if stats.consecutive_failures >= self.max_failures:
+            stats.disabled_until = time.time() + self.cooldown
+            logger.warning(f"Proxy {proxy} disabled for {self.cooldown:.0f}s after {stats.consecutive_failures} failures")
+
+    async def probe(self, proxy: str) -> bool:
+        """فحص وكيل واحد وتحديث إحصائياته"""
+        session = await http_client.get_session()
+        start = time.monotonic()
+        try:
+            async with session.head(PROBE_URL, proxy=proxy, timeout=PROBE_TIMEOUT) as response:
+                ok = response.status < 500
+        except Exception:
+            ok = False
+
+        self.proxies[proxy].last_checked = time.time()
+        if ok:
+            # الوكيل عاد للعمل، نلغي الإيقاف المؤقت
+            self.proxies[proxy].disabled_until = 0.0
+            self.report_success(proxy, time.monotonic() - start)
+        else:
+            # فشل الفحص يعني أن الوكيل لا يعمل، يوقف فوراً حتى الفحص التالي
+            self.report_failure(proxy)
+            self.proxies[proxy].disabled_until = time.time() + self.cooldown
+        return ok
+
+    async def probe_all(self):
+        """فحص جميع الوكلاء بالتوازي"""
+        results = await asyncio.gather(*(self.probe(proxy) for proxy in self.proxies))
+        logger.info(f"Proxy probe finished: {sum(results)}/{len(results)} healthy")
+
+    async def _probe_loop(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.error(f"Error probing proxies: {str(e)}")
+            await asyncio.sleep(self.probe_interval)
+
+    def start(self):
+        """بدء الفحص الدوري في الخلفية"""
+        if self.proxies and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._probe_loop())
+
+    async def stop(self):
+        """إيقاف الفحص الدوري"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> list:
+        """إحصائيات كل وكيل مرتبة حسب التقييم"""
+        return sorted((p.to_dict() for p in self.proxies.values()), key=lambda p: p['score'], reverse=True)
+
+
+# المجمع المشترك
+proxy_pool = ProxyPool.from_env()
@@ -0,0 +1,162 @@
+import re
+import logging
+import importlib
+import urllib.parse
+
+logger = logging.getLogger(__name__)
+
+
+class Downloader:
+    """وصف إضافة تحميل: النطاقات التي تخدمها وأنماط المسارات والدوال المنفذة
+
+    الدوال تكتب بصيغة "module:function" وتحمل عند أول استخدام حتى لا تحمل مكتبات المنصة مبكراً.
+    """
+
+    def __init__(self, name: str, hosts: list, paths: list = None, download: str = None, stream: str = None):
+        self.name = name
+        self.hosts = tuple(host.lower() for host in hosts)
+        # جميع المسارات المقبولة في تعبير واحد مجهز مسبقاً
+        self.path_pattern = re.compile('|'.join(f'(?:{p})' for p in paths), re.IGNORECASE) if paths else None
+        self.download = download
+        self.stream = stream
+        self._resolved = {}
+
+    def matches_path(self, path: str) -> bool:
+        return self.path_pattern is None or self.path_pattern.match(path or '/') is not None
+
+    def _resolve(self, target: str):
+        if target not in self._resolved:
+            module, _, attr = target.partition(':')
+            package = __name__.rpartition('.')[0] or None
+            self._resolved[target] = getattr(importlib.import_module(module, package), attr)
+        return self._resolved[target]
+
+    def get_download(self):
+        """دالة التحميل إلى القرص: func(url, download_dir) -> (path, title)"""
+        return self._resolve(self.download)
+
+    def get_stream(self):
+        """دالة التحميل إلى الذاكرة إذا كانت المنصة تدعمها: func(url, download_dir) -> (buffer, title)"""
+        return self._resolve(self.stream) if self.stream else None
+
+
+class DownloaderRegistry:
+    """جدول توجيه من النطاق إلى إضافة التحميل المناسبة"""
+
+    def __init__(self):
+        self._by_name = {}
+        self._by_host = {}
+
+    def register(self, downloader: Downloader) -> Downloader:
+        self._by_name[downloader.name] = downloader
+        for host in downloader.hosts:
+            if host in self._by_host and self._by_host[host] is not downloader:
+                logger.warning(f"Host {host} re-registered by {downloader.name}")
+            self._by_host[host] = downloader
+        return downloader
+
+    def get(self, name: str) -> Downloader:
+        return self._by_name.get(name)
+
+    @property
+    def names(self) -> list:
+        return list(self._by_name)
+
+    def route(self, url: str) -> Downloader:
+        """إيجاد الإضافة المناسبة للرابط أو None"""
+        url = url.strip()
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        try:
+            parsed = urllib.parse.urlsplit(url)
+        except ValueError:
+            return None
+        host = (parsed.hostname or '').rstrip('.')
+
+        # البحث عن النطاق الكامل ثم النطاقات الأعلى (m.facebook.com ثم facebook.com)
+        while host:
+            downloader = self._by_host.get(host)
+            if downloader:
+                return downloader if downloader.matches_path(parsed.path) else None
+            host = host.partition('.')[2]
+        return None
+
+    def platform(self, url: str) -> str:
+        """اسم المنصة للرابط أو 'unknown'"""
+        downloader = self.route(url)
+        return downloader.name if downloader else 'unknown'
+
+    def is_supported(self, name: str, url: str) -> bool:
+        """التحقق من أن الرابط يتبع المنصة المحددة"""
+        downloader = self.route(url)
+        return downloader is not None and downloader.name == name
+
+
+registry = DownloaderRegistry()
+
+registry.register(Downloader(
+    'youtube',
+    hosts=['youtube.com', 'youtu.be', 'youtube-nocookie.com'],
+    download='.youtube:download_youtube',
+))
+
+registry.register(Downloader(
+    'instagram',
+    hosts=['instagram.com', 'instagr.am'],
+    paths=[
+        r'/(?:[\w\.]+/)?(?:p|reel|reels|tv)/[\w-]+',
+        r'/stories/[\w\.]+/\d+',
+    ],
+    download='.instagram:download_instagram',
+))
+
+registry.register(Downloader(
+    'tiktok',
+    hosts=['tiktok.com', 'douyin.com'],
+    paths=[
+        r'/@[\w\.-]+/video/\d+',
+        r'/[@\w\.-]+/\w+/\d+',
+        r'/t/\w+',
+        r'/v/\d+',
+        r'/video/\d+',
+        r'/\w+',
+    ],
+    download='.tiktok:download_tiktok',
+    stream='.tiktok:stream_tiktok',
+))
+
+registry.register(Downloader(
+    'facebook',
+    hosts=['facebook.com', 'fb.watch', 'fb.com'],
+    paths=[
+        r'/[^/]+/videos/\d+',
+        r'/watch/?$',
+        r'/\w+/posts/\d+',
+        r'/share/[^/]+',
+        r'/reel/\d+',
+        r'/[^/]+',
+    ],
+    download='.facebook:download_facebook',
+))
+
+registry.register(Downloader(
+    'likee',
+    hosts=['likee.video', 'like.video', 'likee.com'],
+    paths=[
+        r'/(?:v|video)/[\w\.-]+',
+        r'/@[\w\.-]+/video/\w+',
+        r'/[\w\.-]+',
+    ],
+    download='.likee:download_likee',
+    stream='.likee:stream_likee',
+))
+
+registry.register(Downloader(
+    'twitter',
+    hosts=['twitter.com', 'x.com'],
+    paths=[
+        r'/[\w]+/status/\d+',
+        r'/i/web/status/\d+',
+    ],
+    download='.twitter:download_twitter',
+))
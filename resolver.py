@@ -0,0 +1,142 @@
+import os
+import time
+import asyncio
+import logging
+import urllib.parse
+from collections import OrderedDict
+import aiohttp
+from . import http_client
+from .canonical import get_video_id, normalize_url
+from .inflight import InFlightRequests
+from .proxy_pool import proxy_pool
+
+logger = logging.getLogger(__name__)
+
+# مدة صلاحية الربط بين الرابط المختصر والرابط الكامل (بالثواني)
+SHORT_LINK_TTL = int(os.getenv("SHORT_LINK_TTL", str(7 * 24 * 3600)))
+
+# الحد الأقصى لعدد الروابط المختصرة المخزنة
+SHORT_LINK_CACHE_SIZE = int(os.getenv("SHORT_LINK_CACHE_SIZE", "10000"))
+
+RESOLVE_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
+RESOLVE_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+}
+
+# نطاقات الروابط المختصرة التي تحتاج تتبع إعادة التوجيه
+SHORT_LINK_HOSTS = {
+    'vm.tiktok.com': 'tiktok',
+    'vt.tiktok.com': 'tiktok',
+    'fb.watch': 'facebook',
+    'l.likee.video': 'likee',
+}
+
+# روابط مختصرة داخل النطاق الرئيسي (مثل tiktok.com/t/...)
+SHORT_LINK_PATHS = {
+    'tiktok.com': '/t/',
+}
+
+
+def is_short_link(url: str) -> bool:
+    """هل الرابط مختصر ويحتاج تتبع إعادة التوجيه لمعرفة الفيديو"""
+    parsed = urllib.parse.urlsplit(normalize_url(url))
+    host = parsed.hostname or ''
+    if host in SHORT_LINK_HOSTS:
+        return True
+    prefix = SHORT_LINK_PATHS.get(host)
+    return prefix is not None and parsed.path.startswith(prefix)
+
+
+class ShortLinkResolver:
+    """تحويل الروابط المختصرة إلى روابط كاملة مع ذاكرة مؤقتة محدودة المدة"""
+
+    def __init__(self, ttl: int = SHORT_LINK_TTL, max_entries: int = SHORT_LINK_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._inflight = InFlightRequests()
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+
+    def _get_cached(self, key: str):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        resolved, expires_at = entry
+        if time.time() > expires_at:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return resolved
+
+    def _store(self, key: str, resolved: str):
+        self._cache[key] = (resolved, time.time() + self.ttl)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def _follow(self, url: str, platform: str) -> str:
+        """تتبع إعادة التوجيه وإرجاع الرابط النهائي"""
+        # روابط تيك توك المختصرة تمر عبر مجمع الوكلاء مثل باقي طلبات تيك توك
+        proxy = proxy_pool.choose() if platform == 'tiktok' else None
+        session = await http_client.get_session()
+        start = time.monotonic()
+        try:
+            async with session.head(url, allow_redirects=True, proxy=proxy,
+                                    headers=RESOLVE_HEADERS, timeout=RESOLVE_TIMEOUT) as response:
+                final_url = str(response.url)
+                status = response.status
+            # بعض الخوادم لا تدعم HEAD
+            if status in (403, 405):
+                async with session.get(url, allow_redirects=True, proxy=proxy,
+                                       headers=RESOLVE_HEADERS, timeout=RESOLVE_TIMEOUT) as response:
+                    final_url = str(response.url)
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            proxy_pool.report_failure(proxy)
+            raise
+        proxy_pool.report_success(proxy, time.monotonic() - start)
+        return final_url
+
+    async def resolve(self, url: str, platform: str = None) -> str:
+        """إرجاع الرابط الكامل للرابط المختصر، أو الرابط نفسه إذا لم يكن مختصراً أو فشل التتبع"""
+        if not is_short_link(url):
+            return url
+
+        key = normalize_url(url)
+        cached = self._get_cached(key)
+        if cached:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        try:
+            # الطلبات المتزامنة لنفس الرابط تنتظر تتبعاً واحداً
+            resolved, joined = await self._inflight.run(key, self._follow, url, platform)
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Could not resolve short link {url}: {str(e)}")
+            return url
+
+        if not joined:
+            self._store(key, resolved)
+            logger.info(f"Resolved short link {url} -> {resolved}")
+        return resolved
+
+    async def canonicalize(self, url: str, platform: str) -> tuple:
+        """إرجاع (الرابط الكامل، معرف الفيديو الثابت) ليستخدم كمفتاح موحد للذاكرة والإحصائيات"""
+        resolved = await self.resolve(url, platform)
+        return resolved, get_video_id(resolved, platform)
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'failures': self.failures,
+        }
+
+
+# المحول المشترك
+short_links = ShortLinkResolver()
@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import time
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# الحد الأقصى للتحميلات المتزامنة لكل منصة
+PLATFORM_LIMITS = {
+    'youtube': 4,
+    'instagram': 3,
+    'tiktok': 3,
+    'facebook': 2,
+    'likee': 4,
+}
+
+# الحد الافتراضي للمنصات غير المذكورة أعلاه
+DEFAULT_PLATFORM_LIMIT = 2
+
+
+class SchedulerBusy(Exception):
+    """يتم رفعه عندما تكون قائمة الانتظار ممتلئة"""
+
+    def __init__(self, message: str = "⏳ البوت مشغول حالياً، الرجاء المحاولة بعد قليل"):
+        super().__init__(message)
+
+
+class DownloadScheduler:
+    """مجدول مهام التحميل مع حد لكل منصة وحد عام وقائمة انتظار محدودة"""
+
+    def __init__(self, global_limit: int = 8, max_queue: int = 32, platform_limits: dict = None):
+        self.global_limit = global_limit
+        self.max_queue = max_queue
+        self.platform_limits = dict(PLATFORM_LIMITS)
+        if platform_limits:
+            self.platform_limits.update(platform_limits)
+
+        self._global = asyncio.Semaphore(global_limit)
+        self._platforms = {}
+
+        # العدادات
+        self.waiting = 0
+        self.running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.platform_waiting = {}
+        self.platform_running = {}
+
+    def _semaphore(self, platform: str) -> asyncio.Semaphore:
+        """الحصول على إشارة المنصة وإنشاؤها عند الحاجة"""
+        if platform not in self._platforms:
+            limit = self.platform_limits.get(platform, DEFAULT_PLATFORM_LIMIT)
+            self._platforms[platform] = asyncio.Semaphore(limit)
+        return self._platforms[platform]
+
+    def is_full(self) -> bool:
+        """التحقق مما إذا كانت قائمة الانتظار ممتلئة"""
+        return self.waiting >= self.max_queue
+
+    def _leave_queue(self, platform: str):
+        self.waiting -= 1
+        self.platform_waiting[platform] -= 1
+
+    async def run(self, platform: str, func, *args, **kwargs):
+        """تشغيل مهمة تحميل عبر المجدول وإرجاع نتيجتها"""
+        if self.is_full():
+            self.rejected += 1
+            logger.warning(f"Scheduler queue full, rejecting {platform} job (waiting={self.waiting})")
+            raise SchedulerBusy()
+
+        self.submitted += 1
+        self.waiting += 1
+        self.platform_waiting[platform] = self.platform_waiting.get(platform, 0) + 1
+        enqueued_at = time.monotonic()
+        queued_at = time.perf_counter()
+        started = False
+
+        try:
+            # نحجز مكان المنصة أولاً حتى لا تحتجز منصة بطيئة الأماكن العامة
+            async with self._semaphore(platform):
+                async with self._global:
+                    started = True
+                    self._leave_queue(platform)
+
+                    wait_time = time.monotonic() - enqueued_at
+                    self.total_wait += wait_time
+                    self.max_wait = max(self.max_wait, wait_time)
+                    tracer.add_span('queue', queued_at, time.perf_counter(), platform=platform)
+
+                    self.running += 1
+                    self.platform_running[platform] = self.platform_running.get(platform, 0) + 1
+                    try:
+                        result = await func(*args, **kwargs)
+                        self.completed += 1
+                        return result
+                    except Exception:
+                        self.failed += 1
+                        raise
+                    finally:
+                        self.running -= 1
+                        self.platform_running[platform] -= 1
+        finally:
+            if not started:
+                self._leave_queue(platform)
+
+    def stats(self) -> dict:
+        """إرجاع عدادات المجدول"""
+        started = self.completed + self.failed + self.running
+        return {
+            'waiting': self.waiting,
+            'running': self.running,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_wait': self.total_wait / started if started else 0.0,
+            'max_wait': self.max_wait,
+            'platform_waiting': dict(self.platform_waiting),
+            'platform_running': dict(self.platform_running),
+        }
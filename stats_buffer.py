@@ -0,0 +1,142 @@
+import os
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# أقصى مدة يبقى فيها التحديث في الذاكرة قبل حفظه (بالمللي ثانية)
+STATS_FLUSH_INTERVAL_MS = int(os.getenv("STATS_FLUSH_INTERVAL_MS", "1000"))
+
+# عدد التحميلات التي تفرض الحفظ فوراً
+STATS_FLUSH_EVENTS = int(os.getenv("STATS_FLUSH_EVENTS", "100"))
+
+
+class UserDelta:
+    """الزيادات المتراكمة لمستخدم واحد"""
+
+    def __init__(self, username: str, first_seen: datetime):
+        self.username = username
+        self.first_seen = first_seen
+        self.downloads = 0
+        self.points = 0
+        self.platforms = Counter()
+
+    def merge(self, other: 'UserDelta'):
+        self.username = other.username or self.username
+        self.first_seen = min(self.first_seen, other.first_seen)
+        self.downloads += other.downloads
+        self.points += other.points
+        self.platforms.update(other.platforms)
+
+
+class StatsBatch:
+    """دفعة تحديثات تحفظ في معاملة واحدة"""
+
+    def __init__(self):
+        self.downloads = []
+        self.users = {}
+        self.days = Counter()
+        # (user_id, month, platform) -> [downloads, points]
+        self.rollup = {}
+
+    def __len__(self):
+        return len(self.downloads)
+
+    def add(self, user_id: int, username: str, platform: str, url: str, points: int, now: datetime):
+        month = now.strftime('%Y-%m')
+        self.downloads.append((user_id, platform, url, now.strftime('%Y-%m-%d %H:%M:%S'), month, points))
+        totals = self.rollup.setdefault((user_id, month, platform), [0, 0])
+        totals[0] += 1
+        totals[1] += points
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users[user_id] = UserDelta(username, now)
+        user.username = username or user.username
+        user.downloads += 1
+        user.points += points
+        user.platforms[platform] += 1
+        self.days[now.strftime('%Y-%m-%d')] += 1
+
+    def merge(self, other: 'StatsBatch'):
+        """إعادة دفعة فشل حفظها إلى المخزن"""
+        self.downloads = other.downloads + self.downloads
+        for user_id, delta in other.users.items():
+            if user_id in self.users:
+                self.users[user_id].merge(delta)
+            else:
+                self.users[user_id] = delta
+        self.days.update(other.days)
+        for key, (downloads, points) in other.rollup.items():
+            totals = self.rollup.setdefault(key, [0, 0])
+            totals[0] += downloads
+            totals[1] += points
+
+
+class StatsBuffer:
+    """تجميع إحصائيات التحميل في الذاكرة وحفظها دفعة واحدة كل فترة أو كل عدد من الأحداث"""
+
+    def __init__(self, db, flush_interval: float = STATS_FLUSH_INTERVAL_MS / 1000, max_events: int = STATS_FLUSH_EVENTS):
+        self.db = db
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self._batch = StatsBatch()
+        self._lock = asyncio.Lock()
+        self._task = None
+        # مراجع مهام الحفظ الفورية حتى لا تحذفها حلقة الأحداث قبل انتهائها
+        self._flush_tasks = set()
+        self.flushes = 0
+        self.flushed_events = 0
+
+    def record(self, user_id: int, username: str, platform: str, url: str, points: int, now: datetime):
+        """إضافة تحميل إلى المخزن دون انتظار قاعدة البيانات"""
+        self._batch.add(user_id, username, platform, url, points, now)
+        if len(self._batch) >= self.max_events:
+            task = asyncio.ensure_future(self.flush())
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: asyncio.Task):
+        self._flush_tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"Error in background stats flush: {str(task.exception())}")
+
+    @property
+    def pending(self) -> int:
+        return len(self._batch)
+
+    async def flush(self):
+        """حفظ جميع التحديثات المتراكمة في معاملة واحدة"""
+        async with self._lock:
+            if not self._batch:
+                return
+            batch, self._batch = self._batch, StatsBatch()
+            try:
+                with tracer.trace('stats_flush', events=len(batch), users=len(batch.users)):
+                    await self.db.apply_stats(batch)
+            except Exception as e:
+                logger.error(f"Error flushing stats ({len(batch)} events): {str(e)}")
+                self._batch.merge(batch)
+                return
+            self.flushes += 1
+            self.flushed_events += len(batch)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """بدء الحفظ الدوري في الخلفية"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """إيقاف الحفظ الدوري وحفظ ما تبقى"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.flush()
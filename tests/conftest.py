@@ -0,0 +1,23 @@
+import os
+import sys
+import importlib.util
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_package():
+    """تحميل مجلد المستودع باسم downloaders كما يستورده bot.py"""
+    if 'downloaders' in sys.modules:
+        return sys.modules['downloaders']
+    spec = importlib.util.spec_from_file_location(
+        'downloaders',
+        os.path.join(REPO_DIR, '__init__.py'),
+        submodule_search_locations=[REPO_DIR]
+    )
+    package = importlib.util.module_from_spec(spec)
+    sys.modules['downloaders'] = package
+    spec.loader.exec_module(package)
+    return package
+
+
+load_package()
@@ -0,0 +1,24 @@
+import pytest
+from downloaders.canonical import extract_video_id, get_video_id, has_video_id
+
+
+@pytest.mark.parametrize('url, video_id', [
+    ('https://likee.video/v/abc12', 'abc12'),
+    ('https://l.likee.video/v/Xy9', 'Xy9'),
+    ('https://likee.video/@bob.x/video/7123', '7123'),
+    ('https://like.video/v/q1', 'q1'),
+])
+def test_likee_ids(url, video_id):
+    assert extract_video_id(url, 'likee') == video_id
+
+
+@pytest.mark.parametrize('url', ['https://likee.video/trending', 'https://likee.video/@bob'])
+def test_likee_pages_have_no_id(url):
+    assert not has_video_id(url, 'likee')
+
+
+def test_fallback_keeps_significant_params():
+    first = get_video_id('https://www.facebook.com/story.php?story_fbid=1&id=4&ref=x', 'facebook')
+    second = get_video_id('https://facebook.com/story.php?id=4&story_fbid=2', 'facebook')
+    assert first == 'https://facebook.com/story.php?id=4&story_fbid=1'
+    assert first != second
@@ -0,0 +1,53 @@
+import sqlite3
+import pytest
+from downloaders import database
+from downloaders.database import Database
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    monkeypatch.setattr(database, 'LEADERBOARD_SIZE', 3)
+    conn = sqlite3.connect(':memory:')
+    Database._create_schema(conn)
+    yield conn
+    conn.close()
+
+
+def add_user(conn, user_id: int, downloads: int, points: int = 0):
+    conn.execute('INSERT OR REPLACE INTO users (user_id, username, downloads, points) VALUES (?, ?, ?, ?)',
+                 (user_id, f"user{user_id}", downloads, points))
+    Database._update_leaderboard(conn, user_id)
+
+
+def leaderboard(conn) -> list:
+    return conn.execute('SELECT user_id, downloads FROM leaderboard ORDER BY downloads DESC').fetchall()
+
+
+def test_fills_until_size(conn):
+    add_user(conn, 1, 5)
+    add_user(conn, 2, 3)
+    add_user(conn, 3, 1)
+    assert leaderboard(conn) == [(1, 5), (2, 3), (3, 1)]
+
+
+def test_replaces_lowest_when_full(conn):
+    for user_id, downloads in ((1, 5), (2, 3), (3, 1)):
+        add_user(conn, user_id, downloads)
+    add_user(conn, 4, 4)
+    assert leaderboard(conn) == [(1, 5), (4, 4), (2, 3)]
+
+
+def test_ignores_user_below_lowest(conn):
+    for user_id, downloads in ((1, 5), (2, 3), (3, 2)):
+        add_user(conn, user_id, downloads)
+    add_user(conn, 4, 2)
+    assert leaderboard(conn) == [(1, 5), (2, 3), (3, 2)]
+
+
+def test_updates_existing_entry(conn):
+    for user_id, downloads in ((1, 5), (2, 3), (3, 1)):
+        add_user(conn, user_id, downloads)
+    conn.execute("UPDATE users SET downloads = 9, username = 'renamed' WHERE user_id = 3")
+    Database._update_leaderboard(conn, 3)
+    assert leaderboard(conn) == [(3, 9), (1, 5), (2, 3)]
+    assert conn.execute('SELECT username FROM leaderboard WHERE user_id = 3').fetchone() == ('renamed',)
@@ -0,0 +1,65 @@
+import pytest
+from downloaders.format_picker import select_format
+
+MB = 1024 * 1024
+
+
+def video(format_id, ext, height, tbr, size=None):
+    return {'format_id': format_id, 'ext': ext, 'vcodec': 'avc1' if ext == 'mp4' else 'vp9',
+            'acodec': 'none', 'height': height, 'tbr': tbr, 'filesize': size}
+
+
+def audio(format_id, ext, tbr, size=None):
+    return {'format_id': format_id, 'ext': ext, 'vcodec': 'none',
+            'acodec': 'mp4a' if ext == 'm4a' else 'opus', 'tbr': tbr, 'filesize': size}
+
+
+def test_prefers_mp4_m4a_over_higher_bitrate_webm():
+    info = {'duration': 60, 'formats': [
+        video('247', 'webm', 720, 1500),
+        video('136', 'mp4', 720, 1200),
+        audio('140', 'm4a', 128),
+        audio('251', 'webm', 160),
+    ]}
+    assert select_format(info, 500 * MB) == '136+140'
+
+
+def test_highest_resolution_within_budget():
+    info = {'formats': [
+        video('137', 'mp4', 1080, 4000, size=60 * MB),
+        video('136', 'mp4', 720, 2000, size=30 * MB),
+        video('135', 'mp4', 480, 1000, size=15 * MB),
+        audio('140', 'm4a', 128, size=2 * MB),
+    ]}
+    assert select_format(info, 50 * MB) == '136+140'
+
+
+def test_size_estimated_from_bitrate_and_duration():
+    # 8000 كيلوبت/ثانية × 100 ثانية = 100MB تقريباً
+    info = {'duration': 100, 'formats': [
+        {'format_id': 'hd', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 1080, 'tbr': 8000},
+        {'format_id': 'sd', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 480, 'tbr': 1000},
+    ]}
+    assert select_format(info, 50 * MB) == 'sd'
+
+
+def test_unknown_sizes_return_none():
+    info = {'formats': [video('136', 'mp4', 720, None), audio('140', 'm4a', None)]}
+    assert select_format(info, 50 * MB) is None
+
+
+def test_all_formats_too_large():
+    info = {'formats': [
+        {'format_id': '18', 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 360, 'filesize': 80 * MB},
+    ]}
+    with pytest.raises(Exception, match="حجم الفيديو كبير جداً"):
+        select_format(info, 50 * MB)
+
+
+def test_audio_only_prefers_m4a():
+    info = {'formats': [
+        audio('251', 'webm', 160, size=4 * MB),
+        audio('140', 'm4a', 128, size=3 * MB),
+        video('136', 'mp4', 720, 2000, size=20 * MB),
+    ]}
+    assert select_format(info, 50 * MB, audio_only=True) == '140'
@@ -0,0 +1,29 @@
+import asyncio
+from downloaders.metadata_cache import MetadataCache
+
+URL = 'https://youtu.be/abcdefghijk'
+
+
+def test_extractor_options_are_part_of_the_key():
+    cache = MetadataCache()
+    generic = {'force_generic_extractor': True}
+
+    async def run():
+        await cache.set(URL, 'youtube', {'id': 'generic'}, generic)
+        assert await cache.get(URL, 'youtube') is None
+        assert (await cache.get(URL, 'youtube', dict(generic, format='best')))['id'] == 'generic'
+
+    asyncio.run(run())
+
+
+def test_hits_do_not_share_nested_formats():
+    cache = MetadataCache()
+
+    async def run():
+        info = await cache.set(URL, 'youtube', {'id': 'x', 'formats': [{'format_id': '18'}]})
+        info['formats'][0]['url'] = 'changed'
+        hit = await cache.get(URL, 'youtube')
+        hit['formats'][0]['filepath'] = 'changed'
+        assert (await cache.get(URL, 'youtube'))['formats'] == [{'format_id': '18'}]
+
+    asyncio.run(run())
@@ -1,142 +1,274 @@
 import os
+import asyncio
 import logging
 import re
 from datetime import datetime
-import yt_dlp
-import requests
-import undetected_chromedriver as uc
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-import time
+from http.cookies import SimpleCookie
+import aiohttp
 import json
+from .browser_pool import browser_pool
+from . import ytdlp_runner
+from . import http_client
+from .proxy_pool import proxy_pool
+from .limits import get_max_file_size
+from .registry import registry
+from .resolver import short_links
+from .tracing import stage, tracer
 
 logger = logging.getLogger(__name__)
 
-# قائمة وكلاء مجانية - يمكنك تحديثها بوكلاء جديدة
-FREE_PROXIES = [
-    'http://51.159.115.233:3128',
-    'http://13.95.173.197:80',
-    'http://167.172.96.117:34913',
-    'http://51.75.206.209:80',
-]
-
-def get_random_proxy():
-    """الحصول على وكيل عشوائي من القائمة"""
-    return random.choice(FREE_PROXIES) if FREE_PROXIES else None
-
 def is_valid_tiktok_url(url: str) -> bool:
     """التحقق من صحة رابط تيك توك"""
-    patterns = [
-        r'https?://(?:www\.)?tiktok\.com/@[\w\.-]+/video/\d+',
-        r'https?://(?:www\.)?tiktok\.com/[@\w\.-]+/\w+/\d+',
-        r'https?://(?:www\.)?vm\.tiktok\.com/\w+',
-        r'https?://(?:www\.)?vt\.tiktok\.com/\w+',
-        r'https?://(?:www\.)?tiktok\.com/t/\w+',
-        r'https?://(?:m\.)?tiktok\.com/v/\d+',
-        r'https?://(?:www\.)?tiktok\.com/\w+',
-        r'https?://(?:www\.)?douyin\.com/video/\d+'
-    ]
-    return any(re.match(pattern, url) for pattern in patterns)
-
-def extract_video_id(url: str) -> str:
+    return registry.is_supported('tiktok', url)
+
+async def extract_video_id(url: str) -> str:
     """استخراج معرف الفيديو من الرابط"""
-    # محاولة استخراج معرف الفيديو من الرابط المباشر
+    # إذا كان الرابط مختصر، نتبع إعادة التوجيه للحصول على الرابط الكامل (مع ذاكرة مؤقتة)
+    url = await short_links.resolve(url, 'tiktok')
+    
     video_id_match = re.search(r'/video/(\d+)', url)
     if video_id_match:
         return video_id_match.group(1)
     
-    # إذا كان الرابط مختصر، نتبع إعادة التوجيه للحصول على الرابط الكامل
-    try:
-        proxy = get_random_proxy()
-        proxies = {'http': proxy, 'https': proxy} if proxy else None
-        response = requests.head(url, allow_redirects=True, timeout=30, proxies=proxies)
-        final_url = response.url
-        video_id_match = re.search(r'/video/(\d+)', final_url)
-        if video_id_match:
-            return video_id_match.group(1)
-    except:
-        pass
-    
     return None
 
-def get_video_info(url: str) -> dict:
-    """الحصول على معلومات الفيديو باستخدام selenium"""
-    options = uc.ChromeOptions()
-    options.add_argument('--headless')  # تشغيل المتصفح بدون واجهة
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
+# ترويسات طلبات HTTP لصفحات تيك توك
+TIKTOK_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Referer': 'https://www.tiktok.com/'
+}
+
+# مهلة تحميل صفحة الفيديو
+PAGE_TIMEOUT = aiohttp.ClientTimeout(total=15)
+
+# عدد محاولات تحميل الفيديو، كل محاولة عبر وكيل مختلف أو اتصال مباشر
+FETCH_ATTEMPTS = 2
+
+# أنماط بيانات الصفحة المضمنة (JSON)
+HYDRATION_PATTERNS = [
+    re.compile(r'<script[^>]+id="__UNIVERSAL_DATA_FOR_REHYDRATION__"[^>]*>(.*?)</script>', re.S),
+    re.compile(r'<script[^>]+id="SIGI_STATE"[^>]*>(.*?)</script>', re.S),
+]
+
+# إحصائيات نجاح كل طريقة استخراج
+EXTRACTION_STATS = {
+    'http': {'hits': 0, 'misses': 0},
+    'ytdlp': {'hits': 0, 'misses': 0},
+    'browser': {'hits': 0, 'misses': 0},
+}
+
+def get_extraction_stats() -> dict:
+    """إرجاع نسبة نجاح كل طريقة استخراج"""
+    stats = {}
+    for method, counts in EXTRACTION_STATS.items():
+        total = counts['hits'] + counts['misses']
+        stats[method] = dict(counts, hit_rate=counts['hits'] / total if total else 0.0)
+    return stats
+
+def parse_hydration_data(html: str) -> dict:
+    """استخراج بيانات الفيديو من JSON المضمن في الصفحة"""
+    for pattern in HYDRATION_PATTERNS:
+        match = pattern.search(html)
+        if not match:
+            continue
+        data = json.loads(match.group(1))
+        
+        # الصيغة الحديثة
+        item = (data.get('__DEFAULT_SCOPE__', {})
+                    .get('webapp.video-detail', {})
+                    .get('itemInfo', {})
+                    .get('itemStruct'))
+        if item:
+            return item
+        
+        # الصيغة القديمة
+        items = data.get('ItemModule') or {}
+        if items:
+            return next(iter(items.values()))
+    return None
+
+def _pick_play_url(video: dict) -> str:
+    """اختيار رابط التشغيل من بيانات الفيديو"""
+    for key in ('playAddr', 'downloadAddr'):
+        value = video.get(key)
+        if isinstance(value, str) and value:
+            return value
+        if isinstance(value, list) and value:
+            return value[0]
+    for bitrate in video.get('bitrateInfo') or []:
+        urls = (bitrate.get('PlayAddr') or {}).get('UrlList') or []
+        if urls:
+            return urls[0]
+    return None
+
+async def get_video_info_http(url: str) -> dict:
+    """الطريقة السريعة: قراءة JSON المضمن في الصفحة عبر HTTP فقط"""
+    session = await http_client.get_session()
+    async with session.get(url, headers=TIKTOK_HEADERS, timeout=PAGE_TIMEOUT) as response:
+        if response.status != 200:
+            return None
+        html = await response.text()
+        cookies = {name: morsel.value for name, morsel in response.cookies.items()}
+        final_url = str(response.url)
+    
+    item = parse_hydration_data(html)
+    if not item:
+        return None
+    
+    video_url = _pick_play_url(item.get('video') or {})
+    if not video_url:
+        return None
+    
+    return {
+        'url': video_url,
+        'title': item.get('desc') or f"tiktok_video_{item.get('id')}",
+        'headers': dict(TIKTOK_HEADERS, Referer=final_url),
+        'cookies': cookies
+    }
+
+async def get_video_info_ytdlp(url: str) -> dict:
+    """الطريقة الثانية: مستخرج تيك توك في yt-dlp"""
+    info = await ytdlp_runner.extract_info({'quiet': True, 'no_warnings': True}, url, 'tiktok')
+    if not info or not info.get('url'):
+        return None
+    
+    cookies = {}
+    if info.get('cookies'):
+        cookies = {name: morsel.value for name, morsel in SimpleCookie(info['cookies']).items()}
+    
+    return {
+        'url': info['url'],
+        'title': info.get('title') or info.get('description'),
+        'headers': info.get('http_headers') or TIKTOK_HEADERS,
+        'cookies': cookies
+    }
+
+async def resolve_video_info(url: str) -> dict:
+    """الحصول على معلومات الفيديو بالطريقة الأسرع المتاحة مع الرجوع للمتصفح عند الفشل"""
+    methods = (
+        ('http', get_video_info_http),
+        ('ytdlp', get_video_info_ytdlp),
+        ('browser', get_video_info),
+    )
+    for method, func in methods:
+        try:
+            video_info = await func(url)
+        except Exception as e:
+            logger.warning(f"TikTok {method} extraction failed: {str(e)}")
+            video_info = None
+        
+        if video_info and video_info.get('url'):
+            EXTRACTION_STATS[method]['hits'] += 1
+            tracer.annotate(method=method)
+            logger.info(f"TikTok extraction via {method}: {get_extraction_stats()[method]}")
+            return video_info
+        EXTRACTION_STATS[method]['misses'] += 1
     
-    driver = uc.Chrome(options=options)
+    return None
+
+# سكربت يعيد رابط الفيديو فور توفره في الصفحة
+VIDEO_SRC_SCRIPT = """
+const video = document.querySelector('video');
+if (!video) return null;
+const source = video.querySelector('source');
+const src = video.currentSrc || video.src || (source && source.src);
+return src && !src.startsWith('blob:') ? src : null;
+"""
+
+def _read_video_info(driver, url: str, timeout: int = 20) -> dict:
+    """قراءة رابط الفيديو وعنوانه من الصفحة (تعمل في خيط منفصل)"""
+    from selenium.webdriver.support.ui import WebDriverWait
     try:
         driver.get(url)
-        # انتظار حتى يتم تحميل الفيديو
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.TAG_NAME, "video"))
+        # انتظار حتى يصبح رابط الفيديو متاحاً بدلاً من الانتظار لمدة ثابتة
+        video_url = WebDriverWait(driver, timeout, poll_frequency=0.2).until(
+            lambda d: d.execute_script(VIDEO_SRC_SCRIPT)
         )
         
-        # إعطاء وقت إضافي للتأكد من تحميل كل شيء
-        time.sleep(3)
-        
-        # الحصول على عنصر الفيديو
-        video_element = driver.find_element(By.TAG_NAME, "video")
-        video_url = video_element.get_attribute('src')
-        
         # الحصول على معلومات إضافية
         title = driver.title
+        cookies = {cookie['name']: cookie['value'] for cookie in driver.get_cookies()}
         
         return {
             'url': video_url,
-            'title': title
+            'title': title,
+            'headers': dict(TIKTOK_HEADERS, Referer=url),
+            'cookies': cookies
         }
     finally:
-        driver.quit()
+        # إفراغ التبويب لإعادة استخدامه في الطلب التالي
+        driver.get('about:blank')
+
+async def get_video_info(url: str) -> dict:
+    """الحصول على معلومات الفيديو باستخدام متصفح من المجمع"""
+    return await browser_pool.run(_read_video_info, url)
+
+async def get_tiktok_video(url: str) -> tuple:
+    """الحصول على (معلومات الفيديو، معرف الفيديو) من رابط تيك توك"""
+    # التحقق من صحة الرابط
+    if not is_valid_tiktok_url(url):
+        raise Exception("هذا ليس رابط تيك توك صحيح")
+    
+    # استخراج معرف الفيديو
+    video_id = await extract_video_id(url)
+    if not video_id:
+        raise Exception("لم يتم العثور على معرف الفيديو")
+    
+    # الحصول على معلومات الفيديو
+    with stage('tiktok', 'extract'):
+        video_info = await resolve_video_info(url)
+    if not video_info or not video_info.get('url'):
+        raise Exception("لم يتم العثور على رابط الفيديو")
+    
+    video_info.setdefault('title', f'tiktok_video_{video_id}')
+    return video_info, video_id
+
+async def fetch_video(fetch, video_info: dict, *args, **kwargs):
+    """تحميل رابط الفيديو عبر وكيل من المجمع وإعادة المحاولة مرة عبر وكيل آخر أو اتصال مباشر"""
+    tried = []
+    while True:
+        proxy = proxy_pool.choose(exclude=tried)
+        try:
+            with stage('tiktok', 'download', proxy=bool(proxy), attempt=len(tried) + 1):
+                result = await fetch(
+                    video_info['url'],
+                    *args,
+                    max_bytes=get_max_file_size(),
+                    platform='tiktok',
+                    headers=video_info.get('headers'),
+                    cookies=video_info.get('cookies'),
+                    proxy=proxy,
+                    **kwargs
+                )
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            proxy_pool.report_failure(proxy)
+            tried.append(proxy)
+            if len(tried) >= FETCH_ATTEMPTS:
+                raise
+            logger.warning(f"TikTok download failed via {proxy or 'direct connection'}, retrying: {str(e)}")
+            continue
+        proxy_pool.report_success(proxy)
+        return result
 
 async def download_tiktok(url: str, download_dir: str) -> tuple:
     """تحميل الفيديو من تيك توك"""
     try:
-        # التحقق من صحة الرابط
-        if not is_valid_tiktok_url(url):
-            raise Exception("هذا ليس رابط تيك توك صحيح")
-            
         # إنشاء مجلد التحميلات إذا لم يكن موجوداً
         os.makedirs(download_dir, exist_ok=True)
             
         logger.info(f"بدء تحميل فيديو تيك توك: {url}")
         
-        # استخراج معرف الفيديو
-        video_id = extract_video_id(url)
-        if not video_id:
-            raise Exception("لم يتم العثور على معرف الفيديو")
-        
-        # الحصول على معلومات الفيديو
-        video_info = get_video_info(url)
-        if not video_info or not video_info.get('url'):
-            raise Exception("لم يتم العثور على رابط الفيديو")
+        video_info, video_id = await get_tiktok_video(url)
         
         # تحميل الفيديو
-        video_url = video_info['url']
-        title = video_info.get('title', f'tiktok_video_{video_id}')
+        title = video_info['title']
         filename = f"tiktok_{datetime.now().strftime('%Y%m%d%H%M%S')}_{video_id}.mp4"
         filepath = os.path.join(download_dir, filename)
         
-        # تحميل الفيديو باستخدام requests
-        proxy = get_random_proxy()
-        proxies = {'http': proxy, 'https': proxy} if proxy else None
-        response = requests.get(video_url, stream=True, timeout=60, proxies=proxies)
-        if response.status_code != 200:
-            raise Exception("فشل في تحميل الفيديو")
-        
-        # حفظ الفيديو
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        
-        # التحقق من حجم الملف
-        if os.path.getsize(filepath) > 50 * 1024 * 1024:  # 50MB
-            os.remove(filepath)
-            raise Exception("حجم الفيديو كبير جداً")
+        # تحميل الفيديو وحفظه عبر الجلسة المشتركة
+        await fetch_video(http_client.download_to_file, video_info, filepath)
         
         logger.info(f"تم تحميل الفيديو بنجاح: {filepath}")
         return filepath, title
@@ -153,6 +285,21 @@ async def download_tiktok(url: str, download_dir: str) -> tuple:
             pass
         raise
 
+async def stream_tiktok(url: str, download_dir: str = None) -> tuple:
+    """تحميل الفيديو إلى مخزن مؤقت للرفع مباشرة دون المرور بمجلد التحميلات"""
+    try:
+        logger.info(f"بدء تحميل فيديو تيك توك إلى الذاكرة: {url}")
+        
+        video_info, video_id = await get_tiktok_video(url)
+        buffer = await fetch_video(http_client.download_to_buffer, video_info, spool_dir=download_dir)
+        
+        logger.info(f"تم تحميل الفيديو بنجاح: {video_id}")
+        return buffer, video_info['title']
+        
+    except Exception as e:
+        logger.error(f"خطأ في تحميل فيديو تيك توك: {str(e)}")
+        raise
+
 # اختبار الكود إذا تم تشغيله مباشرة
 if __name__ == "__main__":
     import asyncio
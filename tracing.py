@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import uuid
+import random
+import logging
+import contextlib
+import contextvars
+from logging.handlers import RotatingFileHandler
+from .metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# ملف التتبعات المكتملة (فارغ لتعطيل التتبع)
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+# الحجم الأقصى للملف قبل تدويره وعدد النسخ القديمة المحفوظة
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_MB", "20")) * 1024 * 1024
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", "5"))
+
+# التتبعات الأبطأ من هذا الحد (بالمللي ثانية) أو الفاشلة تحفظ دائماً
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "5000"))
+
+# نسبة التتبعات السريعة الناجحة التي تحفظ أيضاً للمقارنة
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+
+# الحد الأقصى لعدد الفترات في التتبع الواحد
+MAX_SPANS = 256
+
+# الفترة الحالية في المهمة الجارية، تنتقل تلقائياً للمهام التي تنشأ منها
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """فترة زمنية لمرحلة واحدة داخل التتبع"""
+
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'start', 'end', 'attrs', 'error', '_token')
+
+    def __init__(self, trace: 'Trace', name: str, parent_id: int = None, start: float = None, attrs: dict = None):
+        self.trace = trace
+        self.name = name
+        self.span_id = len(trace.spans)
+        self.parent_id = parent_id
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+        self.attrs = attrs or {}
+        self.error = None
+        self._token = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        data = {
+            'name': self.name,
+            'id': self.span_id,
+            'parent': self.parent_id,
+            'offset_ms': round((self.start - self.trace.root.start) * 1000, 3),
+            'duration_ms': round(((self.end or time.perf_counter()) - self.start) * 1000, 3),
+        }
+        if self.attrs:
+            data['attrs'] = self.attrs
+        if self.error:
+            data['error'] = self.error
+        return data
+
+
+class Trace:
+    """جميع فترات مهمة واحدة من بدايتها حتى نهايتها"""
+
+    def __init__(self, name: str, attrs: dict):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started_at = time.time()
+        self.spans = []
+        self.dropped = 0
+        self.root = self.add(name, None, attrs=attrs)
+
+    def add(self, name: str, parent_id: int, start: float = None, attrs: dict = None) -> Span:
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return None
+        span = Span(self, name, parent_id, start, attrs)
+        self.spans.append(span)
+        return span
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.root.end or time.perf_counter()) - self.root.start) * 1000
+
+    def to_dict(self) -> dict:
+        data = {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'started_at': round(self.started_at, 3),
+            'duration_ms': round(self.duration_ms, 3),
+            'attrs': self.root.attrs,
+            'error': self.root.error,
+            'spans': [span.to_dict() for span in self.spans[1:]],
+        }
+        if self.dropped:
+            data['dropped_spans'] = self.dropped
+        return data
+
+
+class Tracer:
+    """تتبع مراحل المهام وحفظ التتبعات البطيئة والفاشلة وعينة من الباقي في ملف JSONL مدور"""
+
+    def __init__(self, path: str = TRACE_FILE, max_bytes: int = TRACE_MAX_BYTES, backups: int = TRACE_BACKUPS,
+                 slow_ms: float = TRACE_SLOW_MS, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.slow_ms = slow_ms
+        self.sample_rate = sample_rate
+        self._writer = None
+        self.finished = 0
+        self.written = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _get_writer(self) -> logging.Logger:
+        """مسجل مستقل يكتب سطراً لكل تتبع مع تدوير الملف حسب الحجم"""
+        if self._writer is None:
+            writer = logging.getLogger(f"{__name__}.writer")
+            writer.propagate = False
+            writer.setLevel(logging.INFO)
+            handler = RotatingFileHandler(self.path, maxBytes=self.max_bytes, backupCount=self.backups, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            writer.addHandler(handler)
+            self._writer = writer
+        return self._writer
+
+    def start(self, name: str, **attrs) -> Span:
+        """بدء تتبع جديد وجعل فترته الجذرية الفترة الحالية، أو None إذا كان التتبع معطلاً"""
+        if not self.enabled:
+            return None
+        root = Trace(name, attrs).root
+        root._token = _current_span.set(root)
+        return root
+
+    def finish(self, root: Span, error: BaseException = None):
+        """إنهاء التتبع وحفظه إذا كان بطيئاً أو فاشلاً أو ضمن العينة"""
+        if root is None or root.end is not None:
+            return
+        root.end = time.perf_counter()
+        if error is not None:
+            root.error = f"{type(error).__name__}: {error}"
+        if root._token is not None:
+            try:
+                _current_span.reset(root._token)
+            except ValueError:
+                # الإنهاء من سياق مختلف عن سياق البدء
+                _current_span.set(None)
+            root._token = None
+
+        self.finished += 1
+        trace = root.trace
+        if root.error or trace.duration_ms >= self.slow_ms or random.random() < self.sample_rate:
+            self.write(trace)
+
+    def write(self, trace: Trace):
+        try:
+            self._get_writer().info(json.dumps(trace.to_dict(), ensure_ascii=False, default=str))
+            self.written += 1
+        except Exception as e:
+            logger.warning(f"Error writing trace {trace.trace_id}: {str(e)}")
+
+    @contextlib.contextmanager
+    def trace(self, name: str, **attrs):
+        """تتبع كامل لكتلة واحدة (مثل حفظ الإحصائيات) إذا لم تكن داخل تتبع آخر"""
+        if _current_span.get() is not None:
+            with self.span(name, **attrs) as span:
+                yield span
+            return
+        root = self.start(name, **attrs)
+        try:
+            yield root
+        except BaseException as e:
+            self.finish(root, e)
+            raise
+        self.finish(root)
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attrs):
+        """فترة فرعية من الفترة الحالية، لا تسجل شيئاً خارج التتبع"""
+        parent = _current_span.get()
+        span = parent.trace.add(name, parent.span_id, attrs=attrs) if parent is not None else None
+        if span is None:
+            yield None
+            return
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+
+    def add_span(self, name: str, start: float, end: float, **attrs):
+        """إضافة فترة منتهية بأوقات معروفة (perf_counter) تحت الفترة الحالية"""
+        parent = _current_span.get()
+        if parent is None:
+            return
+        span = parent.trace.add(name, parent.span_id, start=start, attrs=attrs)
+        if span is not None:
+            span.end = end
+
+    def annotate(self, **attrs):
+        """إضافة معلومات إلى الفترة الحالية"""
+        span = _current_span.get()
+        if span is not None:
+            span.set(**attrs)
+
+    @staticmethod
+    def active() -> bool:
+        return _current_span.get() is not None
+
+
+# المتتبع المشترك
+tracer = Tracer()
+
+
+@contextlib.contextmanager
+def stage(platform: str, name: str, **attrs):
+    """مرحلة من مهمة التحميل: تقاس في bot_stage_duration_seconds وتسجل كفترة في التتبع"""
+    with STAGE_SECONDS.time(platform=platform or 'unknown', stage=name), tracer.span(name, platform=platform, **attrs) as span:
+        yield span
@@ -1,7 +1,7 @@
 import os
 import logging
-import asyncio
-import yt_dlp
+from . import ytdlp_runner
+from .registry import registry
 
 logger = logging.getLogger(__name__)
 
@@ -9,7 +9,7 @@ async def download_twitter(url: str, download_dir: str) -> tuple:
     """تحميل الفيديو من تويتر"""
     try:
         # التحقق من صحة الرابط
-        if not ('twitter.com' in url or 'x.com' in url):
+        if not registry.is_supported('twitter', url):
             raise Exception("❌ هذا ليس رابط تويتر صحيح")
             
         # إنشاء مجلد التحميلات إذا لم يكن موجوداً
@@ -21,28 +21,24 @@ async def download_twitter(url: str, download_dir: str) -> tuple:
         # تكوين خيارات التحميل
         ydl_opts = {
             'format': 'best',  # أفضل جودة متاحة
-            'outtmpl': os.path.join(download_dir, '%(title)s.%(ext)s'),
+            'outtmpl': os.path.join(download_dir, 'twitter_%(id)s.%(ext)s'),
             'quiet': True,
             'no_warnings': True,
             'extract_flat': False,
             'cookiefile': 'cookies.txt',  # ملف الكوكيز للتغلب على قيود تويتر
         }
         
-        # تحميل الفيديو
-        loop = asyncio.get_event_loop()
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = await loop.run_in_executor(None, ydl.extract_info, url, False)
-            video_title = info.get('title', 'twitter_video')
-            video_path = os.path.join(download_dir, f"{video_title}.{info['ext']}")
-            await loop.run_in_executor(None, ydl.download, [url])
+        # تحميل الفيديو بأفضل صيغة ضمن الحد المسموح
+        video_path, info = await ytdlp_runner.download_within_limit(ydl_opts, url, 'twitter')
+        video_title = info.get('title', 'twitter_video')
             
         if not os.path.exists(video_path):
             raise Exception("❌ فشل تحميل الفيديو")
             
         logger.info(f"تم تحميل فيديو تويتر بنجاح: {video_title}")
-        return video_path, "تم التحميل بنجاح ✅"
+        return video_path, video_title
         
     except Exception as e:
         error_msg = str(e) if str(e) != "" else "❌ حدث خطأ أثناء تحميل الفيديو"
         logger.error(f"خطأ في تحميل فيديو تويتر: {error_msg}")
-        return None, error_msg
+        raise Exception(error_msg)
@@ -0,0 +1,177 @@
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from .metadata_cache import metadata_cache
+from .format_picker import select_format
+from .limits import get_max_file_size
+from .metrics import DOWNLOADED_BYTES
+from .tracing import stage, tracer
+
+logger = logging.getLogger(__name__)
+
+# نوع المجمع المستخدم لتشغيل yt-dlp: thread أو process
+YTDLP_EXECUTOR = os.getenv("YTDLP_EXECUTOR", "thread").lower()
+
+# عدد العمال في المجمع
+YTDLP_WORKERS = int(os.getenv("YTDLP_WORKERS", "4"))
+
+_executor = None
+
+
+def get_executor():
+    """الحصول على مجمع تشغيل yt-dlp وإنشاؤه عند أول استخدام"""
+    global _executor
+    if _executor is None:
+        if YTDLP_EXECUTOR == 'process':
+            _executor = ProcessPoolExecutor(max_workers=YTDLP_WORKERS)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=YTDLP_WORKERS, thread_name_prefix='yt-dlp')
+        logger.info(f"yt-dlp executor started: {YTDLP_EXECUTOR} x{YTDLP_WORKERS}")
+    return _executor
+
+
+def shutdown_executor():
+    """إيقاف مجمع تشغيل yt-dlp"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _extract_info(ydl_opts: dict, url: str) -> dict:
+    """استخراج معلومات الفيديو (يعمل داخل المجمع)"""
+    import yt_dlp
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        # تحويل المعلومات إلى قاموس قابل للنقل بين العمليات مع الإبقاء على entries للمنشورات المتعددة
+        return ydl.sanitize_info(info)
+
+
+def _downloaded_path(ydl, info: dict) -> str:
+    """الحصول على مسار الملف النهائي بعد التحميل والمعالجة"""
+    for requested in info.get('requested_downloads') or []:
+        if requested.get('filepath'):
+            return requested['filepath']
+    return info.get('filepath') or ydl.prepare_filename(info)
+
+
+def _download_info(ydl_opts: dict, info: dict) -> tuple:
+    """تحميل الفيديو من المعلومات المستخرجة مسبقاً دون إعادة الاستخراج (يعمل داخل المجمع)"""
+    import yt_dlp
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        # اختيار الصيغة يتم من القائمة الموجودة في المعلومات بدون طلبات جديدة للمنصة
+        info = ydl.process_ie_result(info, download=True)
+        if info.get('_type') == 'playlist' and info.get('entries'):
+            info = info['entries'][0]
+        filename = _downloaded_path(ydl, info)
+        return filename, ydl.sanitize_info(info)
+
+
+async def run_in_pool(func, *args):
+    """تشغيل دالة متزامنة داخل المجمع دون حجب حلقة الأحداث"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), func, *args)
+
+
+async def extract_info(ydl_opts: dict, url: str, platform: str = None) -> dict:
+    """استخراج معلومات الفيديو بشكل غير متزامن مع القراءة من الذاكرة المؤقتة أولاً"""
+    if platform:
+        cached = await metadata_cache.get(url, platform, ydl_opts)
+        if cached:
+            logger.info(f"Metadata cache hit for {platform}: {url}")
+            tracer.annotate(metadata_cache='hit')
+            return cached
+
+    with stage(platform, 'extract'):
+        info = await run_in_pool(_extract_info, ydl_opts, url)
+    if platform and info:
+        info = await metadata_cache.set(url, platform, info, ydl_opts)
+    return info
+
+
+async def _download_with_retry(ydl_opts: dict, info: dict, url: str, platform: str) -> tuple:
+    from yt_dlp.utils import DownloadError
+    try:
+        return await run_in_pool(_download_info, ydl_opts, info)
+    except DownloadError as e:
+        # روابط الصيغ في المعلومات المخزنة قد تنتهي صلاحيتها، نعيد الاستخراج مرة واحدة
+        if not (info.get('_from_cache') and url and platform):
+            raise
+        logger.warning(f"Download from cached metadata failed, re-extracting: {str(e)}")
+        await metadata_cache.invalidate(url, platform, ydl_opts)
+        info = await extract_info(ydl_opts, url, platform)
+        return await run_in_pool(_download_info, ydl_opts, info)
+
+
+def _timing_hooks(ydl_opts: dict, events: list) -> dict:
+    """إضافة خطافات تسجل أوقات نهاية النقل وبداية ونهاية كل معالجة لاحقة (ffmpeg) من خيط yt-dlp"""
+    def on_progress(d):
+        if d.get('status') == 'finished':
+            events.append(('transfer', 'finished', time.perf_counter()))
+
+    def on_postprocess(d):
+        if d.get('status') in ('started', 'finished'):
+            events.append((d.get('postprocessor'), d['status'], time.perf_counter()))
+
+    return dict(
+        ydl_opts,
+        progress_hooks=list(ydl_opts.get('progress_hooks') or []) + [on_progress],
+        postprocessor_hooks=list(ydl_opts.get('postprocessor_hooks') or []) + [on_postprocess],
+    )
+
+
+def _record_timings(started: float, events: list):
+    """تحويل الأوقات المسجلة إلى فترات في التتبع الحالي"""
+    opened = {}
+    transfer_end = None
+    for name, status, at in events:
+        if name == 'transfer':
+            transfer_end = at
+        elif status == 'started':
+            opened[name] = at
+        elif name in opened:
+            tracer.add_span(f"postprocess.{name}", opened.pop(name), at)
+    if transfer_end is not None:
+        tracer.add_span('transfer', started, transfer_end)
+
+
+async def download_info(ydl_opts: dict, info: dict, url: str = None, platform: str = None) -> tuple:
+    """تحميل الفيديو من المعلومات المستخرجة وإرجاع (اسم الملف، المعلومات)"""
+    # مرحلة التحميل تشمل المعالجة اللاحقة عبر ffmpeg
+    with stage(platform, 'download'):
+        # الخطافات لا تنتقل إلى مجمع العمليات، فتفصيل المراحل متاح مع مجمع الخيوط فقط
+        events = []
+        if tracer.active() and YTDLP_EXECUTOR != 'process':
+            ydl_opts = _timing_hooks(ydl_opts, events)
+        started = time.perf_counter()
+        try:
+            filename, info = await _download_with_retry(ydl_opts, info, url, platform)
+        finally:
+            _record_timings(started, events)
+    if filename and os.path.exists(filename):
+        DOWNLOADED_BYTES.inc(os.path.getsize(filename), platform=platform or 'unknown')
+    return filename, info
+
+
+async def download_within_limit(ydl_opts: dict, url: str, platform: str, audio_only: bool = False, prepare=None) -> tuple:
+    """استخراج المعلومات واختيار أفضل صيغة ضمن الحد المسموح قبل تحميل أي بايت ثم تحميلها
+
+    prepare(info) اختيارية لتعديل المعلومات أو رفضها قبل اختيار الصيغة، وترجع (اسم الملف، المعلومات)
+    """
+    ydl_opts = dict(ydl_opts)
+    info = await extract_info(ydl_opts, url, platform)
+    if not info:
+        raise FileNotFoundError("❌ لم يتم العثور على الفيديو")
+    if prepare:
+        info = prepare(info)
+
+    max_size = get_max_file_size()
+    selected_format = select_format(info, max_size, audio_only=audio_only)
+    if selected_format:
+        ydl_opts['format'] = selected_format
+    # حماية إضافية عندما يكون الحجم غير معروف مسبقاً
+    ydl_opts['max_filesize'] = max_size
+
+    return await download_info(ydl_opts, info, url, platform)